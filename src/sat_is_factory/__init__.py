@@ -1 +1,3 @@
+from .train_solver import ClosedFormSolver as ClosedFormSolver
+from .train_solver import MixedCargoSolver as MixedCargoSolver
 from .train_solver import Solver as Solver
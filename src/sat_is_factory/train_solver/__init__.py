@@ -1 +1,14 @@
 from sat_is_factory.train_solver.train_solver import Solver as Solver
+from sat_is_factory.train_solver.closed_form import (
+    ClosedFormSolver as ClosedFormSolver,
+)
+from sat_is_factory.train_solver.mixed_cargo import (
+    MixedCargoSolver as MixedCargoSolver,
+)
+from sat_is_factory.train_solver import calibrate as calibrate
+from sat_is_factory.train_solver import fuzz as fuzz
+from sat_is_factory.train_solver import buffers as buffers
+from sat_is_factory.train_solver import plan as plan
+from sat_is_factory.train_solver import portfolio as portfolio
+from sat_is_factory.train_solver import save as save
+from sat_is_factory.train_solver import shell as shell
@@ -1,233 +1,362 @@
 import argparse
 import math
+import sys
+import zlib
+
+from sat_is_factory.train_solver import (
+    MixedCargoSolver,
+    Solver,
+    calibrate,
+    fuzz,
+    plan,
+    portfolio,
+    save,
+    shell,
+)
+from sat_is_factory.train_solver.arguments import Formatter, get_arguments
+from sat_is_factory.train_solver.buffers import BufferSolver
+from sat_is_factory.train_solver.train_solver import CAR_CAPACITY, DOCK_DURATION
+from sat_is_factory.util import fmt_time, pluralize
+
+
+def get_plan_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="train-solver plan",
+        description=plan.__doc__,
+        formatter_class=Formatter,
+    )
+    parser.add_argument("graph", help="Production graph JSON file")
+    parser.add_argument(
+        "--jobs", type=int, help="Number of parallel solvers, defaults to CPU count"
+    )
+    return parser.parse_args(argv)
 
-from sat_is_factory.train_solver import Solver
-from sat_is_factory.train_solver.train_solver import CAR_CAPACITY
-from sat_is_factory.util import fmt_time, pluralize, time
-
-HELP = """
-This program can be used to solve the train throughput equations for single or
-multiple train/car setups.
 
-Depending on the input flags, the program will either:
+def get_import_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="train-solver import",
+        description=save.__doc__,
+        formatter_class=Formatter,
+    )
+    parser.add_argument("save", help="Save file")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        help="Number of parallel decompressors and solvers, defaults to CPU count",
+    )
+    return parser.parse_args(argv)
 
-- Solve the optimal RTD and throughput, when neither are provided
-- Minimize the system while achieving a given --throughput
-- Maximize the throughput for a given --rtd
 
-Throughput (--given by --throughput) is the total amount a train system can
-handle with all trains and cars in the system. This value may be larger than the
-given --source and --sink values if specified.
+def get_calibrate_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="train-solver calibrate",
+        usage="%(prog)s [-h] [--tolerance TOLERANCE] [--jobs JOBS] LOG [ARGS ...]",
+        description=calibrate.__doc__
+        + "\nAny other ARGS are passed on to the solver for every route.",
+        formatter_class=Formatter,
+    )
+    parser.add_argument("log", help="CSV or JSON lines train timing log")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=calibrate.DOCK_TOLERANCE,
+        help="Relative dock time difference from the docking delay to warn about",
+    )
+    parser.add_argument(
+        "--jobs", type=int, help="Number of parallel solvers, defaults to CPU count"
+    )
+    return parser.parse_known_args(argv)
 
-RTD (given by --rtd) is the Round Trip Duration for any one specific train. This
-is most easily measured by timing the duration of a train from "toot-to-toot".
-If there is congestion on the tracks, then an average should be used for closest
-results.
 
-The platform rate (given by --platform) is the total input/output rate for a
-single platform. This is usually 2x the speed of whatever kind of belt/pipe you
-have connected to it.
+def get_fuzz_arguments(argv):
+    parser = argparse.ArgumentParser(
+        prog="train-solver fuzz",
+        description=fuzz.__doc__,
+        formatter_class=Formatter,
+    )
+    parser.add_argument(
+        "--count", type=int, default=100, help="Number of random scenarios"
+    )
+    parser.add_argument("--seed", type=int, help="Random seed")
+    parser.add_argument(
+        "--jobs", type=int, help="Number of parallel solvers, defaults to CPU count"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=10,
+        help="Seconds before a z3 solve is considered inconclusive",
+    )
+    parser.add_argument(
+        "--backend",
+        dest="backends",
+        action="append",
+        choices=list(fuzz.BACKENDS),
+        help="Backend to compare, may be given multiple times, defaults to all",
+    )
+    return parser.parse_args(argv)
 
-The --source argument allows calculating source platform(s) buffer information.
-The --sink option further allows ensuring a final consistent rate to downstream
-consumers of the unloading platform(s). If you pass just --sink, it will set
---source to be equal. These calculations assume each platform has the same
-platform rate and that the source and sink are properly balanced. Balancing
-train stations is sometimes needed to achieve maximum throughput when using the
-wait until fully loaded/unloaded option in game.
 
-It is impossible to achieve perfect platform efficiency due to the docking delay
-in the game, so don't expect to see (100% platform efficiency), this tool can
-help you achieve 100% of source throughput however.
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        return COMMANDS[sys.argv[1]](sys.argv[2:])
 
-Take note of the default values, which assume common stack sizes of 100 and
-maximum platform speeds of 2,400 items/min (or 1,200 m^3/min for fluids). There
-are also somewhat reasonable default maximum values for the number of trains and
-cars per train.
+    args = get_arguments()
 
-Use the `--minimize trains` flag if you wish to solve for routes with fewer
-trains while increasing the number of cars per train. The default is to minimize
-cars, since A) it's much easier to add trains (ignoring congestion) and B) the
-math for adding cars is much simpler.
+    try:
+        strategy = None
+        if args.portfolio:
+            print(", ".join(Solver(args).info))
+            print()
+            strategy, solution = portfolio.solve(
+                args,
+                cache=args.portfolio_cache or portfolio.CACHE,
+                sensitivity=args.sensitivity,
+            )
+        else:
+            if args.cargo is not None:
+                solver = MixedCargoSolver(args)
+            elif args.minimize == "buffers":
+                solver = BufferSolver(args)
+            else:
+                solver = Solver(args)
+            print(", ".join(solver.info))
+            print()
+            if args.cargo is not None:
+                solution = solver.solve()
+            else:
+                solution = solver.solve(sensitivity=args.sensitivity)
 
-For results with more than one train, it is assumed that they are evenly spaced
-and doing so is up to you to implement correctly in-game. If the result calls
-for fully loaded trains, one method to achieve this to set the train to wait
-until it's fully loaded/unloaded AND 0 seconds. A more generic method, if the
-train is partially loaded, or carrying other items, is to set the train to wait
-until one load/unload AND `RTD / number of trains` (TODO: test this).
+        if solution is not None and args.cargo is not None:
+            print_cargo_solution(solution)
+        elif solution is not None:
+            if args.fluid:
+                unit = "m^3"
+            else:
+                unit = "items"
+            print_solution(solution, unit)
+        else:
+            print("No solution found.")
+        if strategy is not None:
+            print()
+            print(f"solved by {strategy}")
 
-For pipes, use --fluid, which sets --stack size appropriately to 50.
-"""
+    except ValueError as e:
+        print(f"Error: {e}")
 
 
-class StackSizeSentinal:
-    def items(self):
-        return 100
+def plan_main(argv):
+    plan_args = get_plan_arguments(argv)
 
-    def fluids(self):
-        return 1600 / CAR_CAPACITY
+    try:
+        graph = plan.load(plan_args.graph)
+        flows = plan.flows(graph)
+        scenarios = [get_arguments(plan.scenario(graph, flow)) for flow in flows]
+        solutions = plan.solve_all(scenarios, jobs=plan_args.jobs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
 
-    def __str__(self):
-        return str(self.items())
+    trains = cars = 0
+    for flow, args, solution in zip(flows, scenarios, solutions):
+        if args.fluid:
+            unit = "m^3"
+        else:
+            unit = "items"
+        print(
+            f"{plan.route_name(flow)}: {round(flow['rate'], 2)} {unit}/min {flow['item']}"
+        )
+        if solution is not None:
+            print(", ".join(solution["info"]))
+            print()
+            print_solution(solution, unit)
+            trains += solution["trains"]
+            cars += solution["trains"] * solution["cars"]
+        else:
+            print("No solution found.")
+        print()
 
+    print(
+        f"{pluralize('route', len(flows))}, {pluralize('train', trains)}, {pluralize('car', cars)} total"
+    )
 
-class PlatformRateSentinal:
-    def item_rate(self):
-        return 2400
 
-    def fluid_rate(self):
-        return 1200
+def import_main(argv):
+    import_args = get_import_arguments(argv)
 
-    def __str__(self):
-        return f"{self.item_rate()} items/min or {self.fluid_rate()} m^3/min"
+    try:
+        routes = save.routes(import_args.save, jobs=import_args.jobs)
+        scenarios = [get_arguments(save.scenario(route)) for route in routes]
+        solutions = plan.solve_all(scenarios, jobs=import_args.jobs)
+    except (OSError, EOFError, ValueError, zlib.error) as e:
+        print(f"Error: {e}")
+        return 1
 
+    for route, args, solution in zip(routes, scenarios, solutions):
+        if args.fluid:
+            unit = "m^3"
+        else:
+            unit = "items"
+        print(
+            f"{' -> '.join(route['stops'])}: {pluralize('platform', route['platforms'])}"
+        )
+        if route["platforms"] < route["cars"]:
+            print(
+                f"warning: only {pluralize('platform', route['platforms'])} for {pluralize('car', route['cars'])}"
+            )
+        if solution is not None:
+            print(", ".join(solution["info"]))
+            print()
+            print_solution(solution, unit)
+        else:
+            print("No solution found.")
+        print()
 
-STACK_SIZE_SENTINAL = StackSizeSentinal()
-PLATFORM_RATE_SENTINAL = PlatformRateSentinal()
+    print(pluralize("route", len(routes)))
 
 
-class Formatter(
-    argparse.ArgumentDefaultsHelpFormatter, argparse.RawDescriptionHelpFormatter
-):
-    pass
+def calibrate_main(argv):
+    calibrate_args, solver_argv = get_calibrate_arguments(argv)
 
+    try:
+        routes = calibrate.calibrate(calibrate.events(calibrate_args.log))
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
 
-def get_arguments():
-    parser = argparse.ArgumentParser(
-        description=HELP,
-        formatter_class=Formatter,
-    )
+    names = [name for name, route in routes.items() if route["rtd"].count > 0]
+    scenarios = [
+        get_arguments(calibrate.scenario(routes[name]) + solver_argv) for name in names
+    ]
+    try:
+        solutions = plan.solve_all(scenarios, jobs=calibrate_args.jobs)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    solutions = dict(zip(names, zip(scenarios, solutions)))
 
-    constants = parser.add_argument_group("constants")
-    constants.add_argument(
-        "--stack",
-        type=int,
-        dest="stack_size",
-        default=STACK_SIZE_SENTINAL,
-        help="Item stack size",
-    )
-    constants.add_argument(
-        "--platform",
-        type=int,
-        dest="platform_rate",
-        default=PLATFORM_RATE_SENTINAL,
-        help="Platform loading speed",
-    )
-    constants.add_argument(
-        "--fluid",
-        action="store_true",
-        help="Using fluids",
-    )
+    for name, route in routes.items():
+        rtd = route["rtd"]
+        dock = route["dock"]
+        print(
+            f"{name}: {pluralize('train', len(route['trains']))}, {pluralize('round trip', rtd.count)}"
+        )
+        if rtd.count == 0:
+            print("not enough arrivals to measure the rtd")
+            print()
+            continue
+        print(
+            f"{fmt_time(rtd.mean / 60)} mean rtd (± {fmt_time(rtd.stdev() / 60)}), "
+            f"{fmt_time(rtd.quantile(0.5) / 60)} median, {fmt_time(rtd.quantile(0.9) / 60)} p90"
+        )
+        deviation = calibrate.dock_deviation(route)
+        if deviation is not None:
+            print(
+                f"{fmt_time(dock.mean / 60)} mean dock time, {fmt_time(dock.min / 60)} shortest"
+            )
+            if abs(deviation) > calibrate_args.tolerance:
+                print(
+                    f"warning: shortest dock time is {round(deviation * 100, 2)}% off the {fmt_time(DOCK_DURATION)} docking delay"
+                )
+
+        args, solution = solutions[name]
+        if args.fluid:
+            unit = "m^3"
+        else:
+            unit = "items"
+        if solution is not None:
+            print(", ".join(solution["info"]))
+            print()
+            print_solution(solution, unit)
+        else:
+            print("No solution found.")
+        print()
 
-    train = parser.add_argument_group("train constraints")
-    train.add_argument(
-        "--trains", type=int, help="Number of trains, otherwise minimized"
-    )
-    train.add_argument(
-        "--max-trains", type=int, default=10, help="Maximum number of trains"
-    )
-    train.add_argument("--cars", type=int, help="Number of cars, otherwise minimized")
-    train.add_argument(
-        "--max-cars", type=int, default=10, help="Maximum number of cars"
-    )
-    train.add_argument(
-        "--minimize",
-        type=str,
-        default="cars",
-        help="Prioritize minimizing either `trains`, `cars`",
-    )
 
-    route = parser.add_argument_group("route constraints")
-    route.add_argument(
-        "--rtd", type=time, help="Round trip duration, otherwise minimized"
-    )
-    route.add_argument(
-        "--throughput", type=float, help="Minimum throughput, otherise maximized"
-    )
+def fuzz_main(argv):
+    fuzz_args = get_fuzz_arguments(argv)
 
-    io = parser.add_argument_group("source and sink values")
-    io.add_argument(
-        "--input",
-        "--source",
-        type=float,
-        dest="source_rate",
-        help="Source input rate",
+    counterexamples = fuzz.fuzz(
+        fuzz_args.count,
+        seed=fuzz_args.seed,
+        jobs=fuzz_args.jobs,
+        backends=fuzz_args.backends,
+        timeout=fuzz_args.timeout,
     )
-    io.add_argument(
-        "--sink",
-        type=float,
-        dest="sink_rate",
-        help="Output sink rate",
+    for counterexample in counterexamples:
+        print(f"train-solver {' '.join(counterexample['argv'])}")
+        for difference in counterexample["differences"]:
+            print(f"  {difference}")
+    print(
+        f"{pluralize('scenario', fuzz_args.count)}, {pluralize('counterexample', len(counterexamples))}"
     )
+    if counterexamples:
+        return 1
 
-    args = parser.parse_args()
-
-    set_io_defaults(args)
-    set_additional_defaults(parser, args)
 
-    if args.source_rate is not None:
-        if args.source_rate == 0:
-            parser.error("--source cannot be 0")
-        elif args.source_rate < 0:
-            parser.error("--source cannot be negative")
-    if args.sink_rate is not None:
-        if args.sink_rate == 0:
-            parser.error("--sink cannot be 0")
-        elif args.sink_rate < 0:
-            parser.error("--sink cannot be negative")
+def shell_main(argv):
+    if argv and argv[0] in ["-h", "--help"]:
+        print(shell.__doc__.strip())
+        return
+    shell.Shell(argv, print_report).cmdloop()
 
-    return args
 
-
-def set_io_defaults(args):
-    if args.sink_rate is not None and args.source_rate is None:
-        args.source_rate = args.sink_rate
-
-
-def set_additional_defaults(parser, args):
-    if args.fluid:
-        if args.stack_size == STACK_SIZE_SENTINAL:
-            args.stack_size = STACK_SIZE_SENTINAL.fluids()
-        else:
-            parser.error("cannot use --stack with --fluid")
-        if args.platform_rate == PLATFORM_RATE_SENTINAL:
-            args.platform_rate = PLATFORM_RATE_SENTINAL.fluid_rate()
+def print_report(args, solution, latency, error):
+    print()
+    if error is not None:
+        print(f"Error: {error}")
+    elif solution is None:
+        print("No solution found.")
     else:
-        if args.stack_size == STACK_SIZE_SENTINAL:
-            args.stack_size = STACK_SIZE_SENTINAL.items()
-        if args.platform_rate == PLATFORM_RATE_SENTINAL:
-            args.platform_rate = PLATFORM_RATE_SENTINAL.item_rate()
-
-
-def main():
-    args = get_arguments()
-
-    try:
-        solver = Solver(args)
-        print(", ".join(solver.info))
+        if args.fluid:
+            unit = "m^3"
+        else:
+            unit = "items"
+        print(", ".join(solution["info"]))
         print()
+        print_solution(solution, unit)
+    print()
+    print(f"solved in {round(latency * 1000, 1)} ms")
 
-        solution = solver.solve()
-        if solution is not None:
-            if args.fluid:
-                unit = "m^3"
-            else:
-                unit = "items"
-            print_solution(solution, unit)
-        else:
-            print("No solution found.")
 
-    except ValueError as e:
-        print(f"Error: {e}")
+COMMANDS = {
+    "plan": plan_main,
+    "calibrate": calibrate_main,
+    "fuzz": fuzz_main,
+    "import": import_main,
+    "shell": shell_main,
+}
 
 
 def print_solution(solution, unit):
     print_train_solution(solution, unit)
+    print_schedule_solution(solution)
     print_station_solution(solution, unit)
+    if "platforms" in solution:
+        print()
+        print_platforms_solution(solution, unit)
     if "source" in solution or "sink" in solution:
         print()
         print_io_solution(solution, unit)
+    if "sensitivity" in solution:
+        print()
+        print_sensitivity_solution(solution, unit)
+
+
+def print_cargo_solution(solution):
+    print(pluralize("train", solution["trains"]))
+    print(pluralize("car", solution["cars"]))
+    print(f"{fmt_time(solution['rtd'])} per round trip.")
+    print_schedule_solution(solution)
+    for item in solution["cargo"]:
+        print()
+        print(f"{item['item']}: {pluralize('car', item['cars'])}")
+        stacks = math.ceil(item["loaded"] / item["stack_size"])
+        print(f"{round(item['loaded'])} items in {pluralize('stack', stacks)} per car")
+        efficiency_msg = f"{round(item['efficiency'], 2)}% platform efficiency"
+        print(
+            f"{round(item['rate'], 2)} of {round(item['throughput'], 2)} items/min throughput ({efficiency_msg})"
+        )
 
 
 def print_train_solution(solution, unit):
@@ -254,6 +383,20 @@ def print_train_solution(solution, unit):
     print(f"{fmt_time(solution['rtd'])} per round trip.")
 
 
+def print_schedule_solution(solution):
+    schedule = solution["schedule"]
+    if solution["trains"] > 1:
+        if schedule["wait"]["full"]:
+            wait_msg = "wait until fully loaded/unloaded"
+        else:
+            wait_msg = (
+                f"wait until one load/unload and {fmt_time(schedule['wait']['time'])}"
+            )
+        print(f"1 train every {fmt_time(schedule['headway'])}, {wait_msg}")
+    for a, b in schedule["collisions"]:
+        print(f"warning: train {a + 1} is still docked when train {b + 1} arrives")
+
+
 def print_station_solution(solution, unit):
     plural_platform = pluralize("platform", solution["cars"], name_only=True)
     print(
@@ -275,13 +418,16 @@ def print_io_solution(solution, unit):
         print(
             f"{round(solution['source']['rate'], 2)} {unit}/min source rate ({source_ratio_msg})"
         )
-        full = solution["source"]["rate"] > solution["drain_rate"]
+        # Without a sink, trains are unloaded as fast as they're loaded.
+        drain_rate = solution.get("drain_rate", solution["throughput"])
+        full = solution["source"]["rate"] > drain_rate
         if not full:
             source_buffer_size = math.ceil(solution["source"]["buffer"]["size"])
             source_buffer_time = fmt_time(solution["source"]["buffer"]["time"])
             print(
                 f"{source_buffer_size} {unit} in source {plural_buffer} empties after {source_buffer_time}"
             )
+            print_storage_solution("source", solution["source"]["buffer"])
         else:
             print("source buffer would be full")
 
@@ -299,9 +445,83 @@ def print_io_solution(solution, unit):
             print(
                 f"{sink_buffer_size} {unit} in sink {plural_buffer} fills after {sink_buffer_time}"
             )
+            print_storage_solution("sink", solution["sink"]["buffer"])
         else:
             print("sink buffer would be empty")
 
 
+def print_platforms_solution(solution, unit):
+    # As for the station, there's no buffer to size when it would be full or
+    # empty.
+    drain_rate = solution.get("drain_rate", solution["throughput"])
+    full = "source" in solution and solution["source"]["rate"] > drain_rate
+    empty = "sink" in solution and solution["sink"]["rate"] > solution["fill_rate"]
+    platforms = solution["platforms"]
+    for i, car in enumerate(platforms["cars"]):
+        time = fmt_time(max(car["time"].values()))
+        print(
+            f"car {i + 1}: {car['source']}/{car['sink']} {unit}/min platforms, "
+            f"{round(car['loaded'])} {unit} in {time} ({car['limit']} bound)"
+        )
+        for kind, buffer in car.get("buffer", {}).items():
+            if (kind == "source" and full) or (kind == "sink" and empty):
+                continue
+            print(
+                f"  {math.ceil(buffer['size'])} {unit} in {kind} buffer, cleared after {fmt_time(buffer['time'])}"
+            )
+    print(f"car {platforms['bottleneck'] + 1} is the last to be loaded/unloaded")
+    if full:
+        print("source buffer would be full")
+    if empty:
+        print("sink buffer would be empty")
+
+
+def print_sensitivity_solution(solution, unit):
+    sensitivity = solution["sensitivity"]
+    if sensitivity["regime"] == "platform":
+        print("platform bound, trains leave partially filled")
+    elif sensitivity["regime"] == "capacity":
+        print("capacity bound, trains leave full")
+    else:
+        print("balanced, trains leave just filled")
+
+    def signed(value):
+        # Adding 0 turns a rounded -0.0 into 0.0.
+        return f"{round(value, 2) + 0:+}"
+
+    def change(values):
+        return (
+            f"{signed(values['throughput'])} {unit}/min throughput, "
+            f"{signed(values['efficiency'])}% efficiency, "
+            f"{signed(values['loaded'])} {unit} loaded"
+        )
+
+    print(f"per second of rtd: {change(sensitivity['derivatives'])}")
+    labels = {
+        "trains+1": "1 more train",
+        "trains-1": "1 less train",
+        "cars+1": "1 more car",
+        "cars-1": "1 less car",
+        "rtd-10s": "10 sec less rtd",
+    }
+    for key, label in labels.items():
+        values = sensitivity["deltas"][key]
+        if values is None:
+            print(f"{label}: no throughput")
+        else:
+            print(f"{label}: {change(values)}")
+
+
+def print_storage_solution(kind, buffer):
+    if "storage" not in buffer:
+        return
+    buildings = buffer["storage"]["buildings"]
+    if buildings:
+        storage = " and ".join(pluralize(b, n) for b, n in buildings.items())
+        print(f"{storage} per {kind} platform")
+    else:
+        print(f"{kind} platforms hold their own buffers")
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
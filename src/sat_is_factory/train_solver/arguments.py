@@ -0,0 +1,334 @@
+import argparse
+
+from sat_is_factory.train_solver.train_solver import CAR_CAPACITY
+from sat_is_factory.util import cargo, rates, time
+
+HELP = """
+This program can be used to solve the train throughput equations for single or
+multiple train/car setups.
+
+Depending on the input flags, the program will either:
+
+- Solve the optimal RTD and throughput, when neither are provided
+- Minimize the system while achieving a given --throughput
+- Maximize the throughput for a given --rtd
+
+Throughput (--given by --throughput) is the total amount a train system can
+handle with all trains and cars in the system. This value may be larger than the
+given --source and --sink values if specified.
+
+RTD (given by --rtd) is the Round Trip Duration for any one specific train. This
+is most easily measured by timing the duration of a train from "toot-to-toot".
+If there is congestion on the tracks, then an average should be used for closest
+results.
+
+The platform rate (given by --platform) is the total input/output rate for a
+single platform. This is usually 2x the speed of whatever kind of belt/pipe you
+have connected to it.
+
+The --source argument allows calculating source platform(s) buffer information.
+The --sink option further allows ensuring a final consistent rate to downstream
+consumers of the unloading platform(s). If you pass just --sink, it will set
+--source to be equal. These calculations assume each platform has the same
+platform rate and that the source and sink are properly balanced. Balancing
+train stations is sometimes needed to achieve maximum throughput when using the
+wait until fully loaded/unloaded option in game.
+
+It is impossible to achieve perfect platform efficiency due to the docking delay
+in the game, so don't expect to see (100% platform efficiency), this tool can
+help you achieve 100% of source throughput however.
+
+Take note of the default values, which assume common stack sizes of 100 and
+maximum platform speeds of 2,400 items/min (or 1,200 m^3/min for fluids). There
+are also somewhat reasonable default maximum values for the number of trains and
+cars per train.
+
+Use the `--minimize trains` flag if you wish to solve for routes with fewer
+trains while increasing the number of cars per train. The default is to minimize
+cars, since A) it's much easier to add trains (ignoring congestion) and B) the
+math for adding cars is much simpler.
+
+Use `--minimize buffers` with --source or --sink to find the trains and cars
+which need the least storage built next to the source and sink platforms, as
+industrial storage containers (or fluid buffers), on top of what each platform
+holds itself.
+
+For results with more than one train, it is assumed that they are evenly spaced
+and doing so is up to you to implement correctly in-game. The solution includes
+a schedule for this, with trains arriving every `RTD / number of trains`. If the
+result calls for fully loaded trains, set the train to wait until it's fully
+loaded/unloaded. If the train is partially loaded, or carrying other items, set
+the train to wait until one load/unload AND the scheduled loading time, so that
+it leaves the platform before the next train arrives.
+
+With --portfolio, several solver configurations race each other in parallel
+processes, and the fastest for each kind of query is remembered so later runs
+use it directly.
+
+Stations with platforms fed by different belts or pipes can give the rate of
+each platform, in the order of the cars, with --source-platforms and
+--sink-platforms. The train then has one car for each platform, and the
+solution shows what each car carries and which car the train waits for.
+
+With --sensitivity, the solution also shows whether the platforms (trains
+leaving partially filled) or the cars (trains leaving full) limit throughput,
+and what one more or one less train or car, or a 10 second shorter RTD, would
+change, without solving again.
+
+For pipes, use --fluid, which sets --stack size appropriately to 50.
+
+To plan every route of a factory at once, run `train-solver plan FILE` with a
+JSON production graph (see `train-solver plan --help`). To explore changes to a
+route interactively, run `train-solver shell` followed by any of the arguments
+below, then change them one at a time (see `train-solver shell --help`).
+
+Trains carrying more than one item can be solved with --cargo, given once per
+item as ITEM:STACK:RATE. Each car carries a single item, and the cars of every
+train are split between the items so that each item's rate is met. This mode
+requires --rtd, and --cars (if given) is the total number of cars per train.
+"""
+
+
+class StackSizeSentinal:
+    def items(self):
+        return 100
+
+    def fluids(self):
+        return 1600 / CAR_CAPACITY
+
+    def __str__(self):
+        return str(self.items())
+
+
+class PlatformRateSentinal:
+    def item_rate(self):
+        return 2400
+
+    def fluid_rate(self):
+        return 1200
+
+    def __str__(self):
+        return f"{self.item_rate()} items/min or {self.fluid_rate()} m^3/min"
+
+
+# Flags which don't take a value.
+SWITCHES = ["--fluid"]
+
+STACK_SIZE_SENTINAL = StackSizeSentinal()
+PLATFORM_RATE_SENTINAL = PlatformRateSentinal()
+
+
+class Formatter(
+    argparse.ArgumentDefaultsHelpFormatter, argparse.RawDescriptionHelpFormatter
+):
+    pass
+
+
+def get_arguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description=HELP,
+        formatter_class=Formatter,
+    )
+
+    constants = parser.add_argument_group("constants")
+    constants.add_argument(
+        "--stack",
+        type=int,
+        dest="stack_size",
+        default=STACK_SIZE_SENTINAL,
+        help="Item stack size",
+    )
+    constants.add_argument(
+        "--platform",
+        type=int,
+        dest="platform_rate",
+        default=PLATFORM_RATE_SENTINAL,
+        help="Platform loading speed",
+    )
+    constants.add_argument(
+        "--fluid",
+        action="store_true",
+        help="Using fluids",
+    )
+
+    train = parser.add_argument_group("train constraints")
+    train.add_argument(
+        "--trains", type=int, help="Number of trains, otherwise minimized"
+    )
+    train.add_argument(
+        "--max-trains", type=int, default=10, help="Maximum number of trains"
+    )
+    train.add_argument("--cars", type=int, help="Number of cars, otherwise minimized")
+    train.add_argument(
+        "--max-cars", type=int, default=10, help="Maximum number of cars"
+    )
+    train.add_argument(
+        "--minimize",
+        type=str,
+        default="cars",
+        help="Prioritize minimizing either `trains`, `cars` or `buffers`",
+    )
+
+    route = parser.add_argument_group("route constraints")
+    route.add_argument(
+        "--rtd", type=time, help="Round trip duration, otherwise minimized"
+    )
+    route.add_argument(
+        "--throughput", type=float, help="Minimum throughput, otherise maximized"
+    )
+
+    io = parser.add_argument_group("source and sink values")
+    io.add_argument(
+        "--input",
+        "--source",
+        type=float,
+        dest="source_rate",
+        help="Source input rate",
+    )
+    io.add_argument(
+        "--sink",
+        type=float,
+        dest="sink_rate",
+        help="Output sink rate",
+    )
+
+    platforms = parser.add_argument_group("per-platform rates")
+    platforms.add_argument(
+        "--source-platforms",
+        type=rates,
+        metavar="RATE,...",
+        help="Rate of each source platform in car order, which sets --cars",
+    )
+    platforms.add_argument(
+        "--sink-platforms",
+        type=rates,
+        metavar="RATE,...",
+        help="Rate of each sink platform in car order, defaults to the source platforms",
+    )
+
+    mixed = parser.add_argument_group("mixed cargo")
+    mixed.add_argument(
+        "--cargo",
+        type=cargo,
+        action="append",
+        metavar="ITEM:STACK:RATE",
+        help="Item carried alongside other items, may be given multiple times",
+    )
+
+    solver = parser.add_argument_group("solver")
+    solver.add_argument(
+        "--sensitivity",
+        action="store_true",
+        help="Report how throughput responds to one more or less train or car, and a shorter RTD",
+    )
+    solver.add_argument(
+        "--portfolio",
+        action="store_true",
+        help="Race solver strategies in parallel, remembering the fastest for each kind of query",
+    )
+    solver.add_argument(
+        "--portfolio-cache",
+        metavar="PATH",
+        help="Fastest strategies file, defaults to ~/.cache/sat_is_factory/portfolio.json",
+    )
+
+    args = parser.parse_args(argv)
+
+    set_io_defaults(args)
+    set_platform_defaults(parser, args)
+    set_additional_defaults(parser, args)
+
+    if args.source_rate is not None:
+        if args.source_rate == 0:
+            parser.error("--source cannot be 0")
+        elif args.source_rate < 0:
+            parser.error("--source cannot be negative")
+    if args.sink_rate is not None:
+        if args.sink_rate == 0:
+            parser.error("--sink cannot be 0")
+        elif args.sink_rate < 0:
+            parser.error("--sink cannot be negative")
+    if args.cargo is not None:
+        if args.rtd is None:
+            parser.error("--cargo requires --rtd")
+        if args.source_rate is not None or args.throughput is not None:
+            parser.error("cannot use --cargo with --throughput, --source or --sink")
+        if args.portfolio:
+            parser.error("cannot use --cargo with --portfolio")
+        if args.sensitivity:
+            parser.error("cannot use --cargo with --sensitivity")
+        if args.source_platforms is not None:
+            parser.error(
+                "cannot use --cargo with --source-platforms or --sink-platforms"
+            )
+    if args.portfolio and args.minimize == "buffers":
+        parser.error("cannot use --minimize buffers with --portfolio")
+    if args.source_platforms is not None:
+        if args.minimize == "buffers":
+            parser.error("cannot use --minimize buffers with per-platform rates")
+        if args.sensitivity:
+            parser.error("cannot use --sensitivity with per-platform rates")
+
+    return args
+
+
+def set_io_defaults(args):
+    if args.sink_rate is not None and args.source_rate is None:
+        args.source_rate = args.sink_rate
+
+
+def set_platform_defaults(parser, args):
+    if args.source_platforms is None and args.sink_platforms is None:
+        return
+    source = args.source_platforms or args.sink_platforms
+    sink = args.sink_platforms or source
+    if len(source) != len(sink):
+        parser.error("--source-platforms and --sink-platforms must be the same length")
+    if min(source + sink) <= 0:
+        parser.error("platform rates must be positive")
+    if args.platform_rate != PLATFORM_RATE_SENTINAL:
+        parser.error(
+            "cannot use --platform with --source-platforms or --sink-platforms"
+        )
+    if args.cars is not None and args.cars != len(source):
+        parser.error("--cars must be the number of platforms")
+
+    # One car for each platform, and the slowest platform rate.
+    args.source_platforms = source
+    args.sink_platforms = sink
+    args.cars = args.max_cars = len(source)
+    args.platform_rate = min(map(min, source, sink))
+
+
+def set_additional_defaults(parser, args):
+    if args.fluid:
+        if args.stack_size == STACK_SIZE_SENTINAL:
+            args.stack_size = STACK_SIZE_SENTINAL.fluids()
+        else:
+            parser.error("cannot use --stack with --fluid")
+        if args.platform_rate == PLATFORM_RATE_SENTINAL:
+            args.platform_rate = PLATFORM_RATE_SENTINAL.fluid_rate()
+    else:
+        if args.stack_size == STACK_SIZE_SENTINAL:
+            args.stack_size = STACK_SIZE_SENTINAL.items()
+        if args.platform_rate == PLATFORM_RATE_SENTINAL:
+            args.platform_rate = PLATFORM_RATE_SENTINAL.item_rate()
+
+
+def options(argv):
+    """Splits arguments into `(flag, value)` pairs, with no value for switches."""
+    result = []
+    i = 0
+    while i < len(argv):
+        if argv[i] in SWITCHES:
+            result.append((argv[i], None))
+            i += 1
+        else:
+            result.append((argv[i], argv[i + 1]))
+            i += 2
+    return result
+
+
+def join(pairs):
+    """The inverse of `options`."""
+    return [arg for pair in pairs for arg in pair if arg is not None]
@@ -0,0 +1,128 @@
+"""
+Sizes the storage needed at the platforms of the source and sink stations.
+
+With trains arriving every `rtd / trains`, each platform goes without a train
+transferring for part of that headway (at least the docking delay), and must
+gather (or, at a sink, supply) `rate / cars` the whole time. `Buffer` gives the
+size of that for an idle time, which is then split into what the platform
+holds itself and the industrial storage containers or fluid buffers to build
+next to it.
+
+A platform holds more than a car, so evenly spaced trains rarely need any
+storage built, but shorter headways still need smaller buffers. `BufferSolver`
+enumerates (trains, cars) like `ClosedFormSolver`, and keeps the solution with
+the least storage built, then the least buffered in total across the platforms,
+then the usual priorities.
+"""
+
+import math
+
+from sat_is_factory.train_solver.closed_form import ClosedFormSolver
+from sat_is_factory.train_solver.train_solver import DOCK_DURATION, Buffer
+
+# Inventory of a freight platform and an industrial storage container.
+PLATFORM_SLOTS = 48
+CONTAINER_SLOTS = 48
+
+# Capacity in m^3 of a fluid freight platform and the fluid buffers.
+FLUID_PLATFORM_CAPACITY = 2400
+FLUID_BUFFER_CAPACITY = 400
+INDUSTRIAL_FLUID_BUFFER_CAPACITY = 2400
+
+
+def idle(headway, rate, platform_rate):
+    """
+    Longest time a platform with an external `rate` goes without transferring,
+    when a train arrives every `headway` and clears what gathered since the
+    last one.
+    """
+    return max(DOCK_DURATION, headway * (platform_rate - rate) / platform_rate)
+
+
+def storage(size, stack_size, fluid):
+    """Storage to build next to a platform for a buffer of `size`."""
+    if fluid:
+        extra = max(size - FLUID_PLATFORM_CAPACITY, 0)
+        industrial = math.floor(extra / INDUSTRIAL_FLUID_BUFFER_CAPACITY)
+        rest = extra - industrial * INDUSTRIAL_FLUID_BUFFER_CAPACITY
+        small = math.ceil(rest / FLUID_BUFFER_CAPACITY)
+        if small * FLUID_BUFFER_CAPACITY >= INDUSTRIAL_FLUID_BUFFER_CAPACITY:
+            industrial += 1
+            small = 0
+        buildings = {
+            "industrial fluid buffer": industrial,
+            "fluid buffer": small,
+        }
+        capacity = (
+            industrial * INDUSTRIAL_FLUID_BUFFER_CAPACITY
+            + small * FLUID_BUFFER_CAPACITY
+        )
+    else:
+        extra = max(size - PLATFORM_SLOTS * stack_size, 0)
+        containers = math.ceil(extra / (CONTAINER_SLOTS * stack_size))
+        buildings = {"industrial storage container": containers}
+        capacity = containers * CONTAINER_SLOTS * stack_size
+    return {
+        "buildings": {kind: n for kind, n in buildings.items() if n > 0},
+        "capacity": capacity,
+    }
+
+
+class BufferSolver(ClosedFormSolver):
+    """Minimizes the storage built at the source and sink platforms."""
+
+    def priority(self):
+        return ["cars", "trains"]
+
+    def optimize_train(self):
+        super().optimize_train()
+        self.info.insert(0, "minimize buffers")
+
+    def optimize_station(self):
+        if self.args.source_rate is None:
+            raise ValueError("minimizing buffers requires a --source or --sink rate")
+        super().optimize_station()
+
+    def buffers(self, trains, cars, rtd):
+        """
+        Returns the buffer of a platform at the source and sink, or None if
+        the platforms can't keep up with their rates.
+        """
+        rates = {"source": self.args.source_rate, "sink": self.args.sink_rate}
+        result = {}
+        for kind, rate in rates.items():
+            if rate is None:
+                continue
+            if rate / cars >= self.platform_rate:
+                return None
+            buffer = Buffer(
+                rate,
+                cars,
+                self.platform_rate,
+                idle(rtd / trains, rate / cars, self.platform_rate),
+            )
+            result[kind] = {
+                "size": buffer.size,
+                "time": buffer.time,
+                "storage": storage(buffer.size, self.stack_size, self.args.fluid),
+            }
+        return result
+
+    def feasible(self):
+        for trains, cars, rtd, throughput in super().feasible():
+            if self.buffers(trains, cars, rtd) is not None:
+                yield trains, cars, rtd, throughput
+
+    def key(self, trains, cars, rtd, throughput):
+        # Storage built first, then the total buffered, which is also what
+        # decides between solutions whose platforms hold their own buffers.
+        buffers = self.buffers(trains, cars, rtd).values()
+        capacity = sum(b["storage"]["capacity"] * cars for b in buffers)
+        size = sum(b["size"] * cars for b in buffers)
+        return [capacity, size] + super().key(trains, cars, rtd, throughput)
+
+    def solution(self, trains, cars, rtd, throughput):
+        solution = super().solution(trains, cars, rtd, throughput)
+        for kind, buffer in self.buffers(trains, cars, rtd).items():
+            solution[kind]["buffer"] = buffer
+        return solution
@@ -0,0 +1,149 @@
+"""
+Calibrates route RTDs from train timing logs.
+
+Logs are CSV (with a header) or JSON lines, with one event per row:
+
+    route,train,station,event,time
+    ore,train_1,mine,arrive,0
+    ore,train_1,mine,depart,95.2
+
+where event is "arrive" or "depart" and time is in seconds. The RTD of a route
+is measured between consecutive arrivals of the same train at the same
+station, and the dock time between a train's arrival and departure. Logs are
+streamed, keeping only the last event of each train at each station, so memory
+doesn't grow with the length of the log.
+"""
+
+import csv
+import json
+import math
+
+from sat_is_factory.train_solver.train_solver import DOCK_DURATION
+
+# Histogram resolution of distributions, in seconds.
+RESOLUTION = 1
+
+# Relative difference from `DOCK_DURATION` above which it's flagged.
+DOCK_TOLERANCE = 0.1
+
+
+class Distribution:
+    """
+    Running statistics of a stream of values, with a fixed resolution
+    histogram for quantiles.
+    """
+
+    def __init__(self, resolution=RESOLUTION):
+        self.resolution = resolution
+        self.count = 0
+        self.mean = 0
+        self.m2 = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.bins = {}
+
+    def add(self, value):
+        # Welford's online algorithm.
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        bin = math.floor(value / self.resolution)
+        self.bins[bin] = self.bins.get(bin, 0) + 1
+
+    def stdev(self):
+        if self.count < 2:
+            return 0
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def quantile(self, q):
+        """Approximate quantile, to within the resolution."""
+        rank = q * self.count
+        seen = 0
+        for bin in sorted(self.bins):
+            seen += self.bins[bin]
+            if seen >= rank:
+                value = (bin + 0.5) * self.resolution
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "stdev": self.stdev(),
+            "min": self.min,
+            "median": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "max": self.max,
+        }
+
+
+def events(path):
+    """Streams the rows of a CSV or JSON lines log."""
+    with open(path, newline="") as file:
+        first = file.readline()
+        file.seek(0)
+        if first.lstrip().startswith("{"):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+def calibrate(rows, resolution=RESOLUTION):
+    """
+    Returns the RTD and dock time distributions (in seconds) of each route,
+    and the trains seen on it.
+    """
+    routes = {}
+    arrivals = {}
+    for row in rows:
+        route = routes.setdefault(
+            row["route"],
+            {
+                "rtd": Distribution(resolution),
+                "dock": Distribution(resolution),
+                "trains": set(),
+            },
+        )
+        route["trains"].add(row["train"])
+
+        key = (row["route"], row["train"], row["station"])
+        time = float(row["time"])
+        if row["event"] == "arrive":
+            if key in arrivals:
+                route["rtd"].add(time - arrivals[key])
+            arrivals[key] = time
+        elif row["event"] == "depart":
+            if key in arrivals:
+                route["dock"].add(time - arrivals[key])
+        else:
+            raise ValueError(f"invalid event {row['event']}")
+    return routes
+
+
+def dock_deviation(route):
+    """
+    Relative difference between the shortest observed dock time and
+    `DOCK_DURATION`, since the shortest stop includes the least loading.
+    """
+    if route["dock"].count == 0:
+        return None
+    return route["dock"].min / 60 / DOCK_DURATION - 1
+
+
+def scenario(route):
+    """Returns the `train-solver` command line arguments for a route."""
+    trains = str(len(route["trains"]))
+    return [
+        "--rtd",
+        str(route["rtd"].mean / 60),
+        "--trains",
+        trains,
+        "--max-trains",
+        trains,
+    ]
@@ -0,0 +1,313 @@
+import math
+
+from sat_is_factory.train_solver.train_solver import (
+    ABSOLUTE_MAX_CARS,
+    ABSOLUTE_MAX_TRAINS,
+    CAR_CAPACITY,
+    DOCK_DURATION,
+    Buffer,
+    Platforms,
+    Schedule,
+    Sensitivity,
+    is_full,
+    platform_groups,
+)
+
+
+class ClosedFormSolver:
+    """
+    Solves the same problems as `Solver` without z3.
+
+    For a fixed number of trains and cars the train equations have closed form
+    solutions for the RTD and throughput, so this enumerates every allowed
+    (trains, cars) pair and keeps the best one under the same lexicographic
+    objectives `Solver` gives to z3.
+
+    With per-platform rates, cars are filled in order of their rates, and
+    between those points the throughput is `a + c / rtd`, which is solved for
+    the target in each interval in turn.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.setup()
+        self.optimize()
+
+    def setup(self):
+        self.stack_size = self.args.stack_size
+        self.platform_rate = self.args.platform_rate
+        self.groups = None
+        if self.args.source_platforms is not None:
+            self.groups = platform_groups(
+                self.args.source_platforms, self.args.sink_platforms
+            )
+
+    def optimize(self):
+        self.optimize_train()
+        self.optimize_station()
+
+    def optimize_train(self):
+        if self.args.rtd is not None and self.args.rtd <= DOCK_DURATION:
+            raise ValueError("invalid rtd")
+
+        if (
+            self.args.max_trains
+            and self.args.trains
+            and self.args.max_trains < self.args.trains
+        ):
+            raise ValueError("invalid --trains and --max-trains arguments")
+        self.trains = candidates(
+            self.args.trains, self.args.max_trains, ABSOLUTE_MAX_TRAINS
+        )
+
+        if (
+            self.args.max_cars
+            and self.args.cars
+            and self.args.max_cars < self.args.cars
+        ):
+            raise ValueError("invalid --cars and --max-cars arguments")
+        self.cars = candidates(self.args.cars, self.args.max_cars, ABSOLUTE_MAX_CARS)
+
+        self.info = []
+
+        self.minimize = [
+            var for var in self.priority() if getattr(self.args, var) is None
+        ]
+
+        for var in self.minimize:
+            self.info.append(f"minimize {var}")
+
+        if self.args.rtd is None:
+            self.info.append("minimize rtd")
+
+    def priority(self):
+        minimize = ["cars", "trains"]
+        if self.args.minimize is not None:
+            try:
+                minimize.remove(self.args.minimize)
+            except ValueError:
+                raise ValueError(
+                    "invalid minimization priority, must be one of 'cars', 'trains' or 'buffers'"
+                )
+            minimize.insert(0, self.args.minimize)
+        return minimize
+
+    def optimize_station(self):
+        if (
+            self.args.rtd is None
+            and self.args.throughput is None
+            and self.args.source_rate is None
+        ):
+            self.info.append("optimal")
+            self.target = None
+        elif self.args.throughput is not None:
+            self.info.append(f"minimize throughput >= {self.args.throughput}")
+            self.target = self.args.throughput
+        elif self.args.source_rate is not None:
+            self.info.append(f"minimize throughput >= {self.args.source_rate}")
+            self.target = self.args.source_rate
+        else:
+            self.info.append("maximizing throughput")
+            self.target = None
+
+    def rtd(self, trains, cars):
+        """Returns the RTD of a candidate, or None if it has no solution."""
+        if self.args.rtd is not None:
+            return self.args.rtd
+        elif self.target is None:
+            # Optimal, where the partial and full equations meet.
+            return trains * (
+                DOCK_DURATION + CAR_CAPACITY * self.stack_size / self.platform_rate
+            )
+
+        if self.groups is not None:
+            return self.platforms_rtd(trains)
+
+        # Smallest RTD for which the partial equation meets the target, which
+        # must still be small enough for the full equation to meet it too.
+        station_rate = self.platform_rate * cars
+        if station_rate <= self.target:
+            return None
+        rtd = max(
+            DOCK_DURATION * trains * station_rate / (station_rate - self.target),
+            DOCK_DURATION,
+        )
+        if rtd > CAR_CAPACITY * self.stack_size * trains * cars / self.target:
+            return None
+        return rtd
+
+    def platforms_rtd(self, trains):
+        """Smallest RTD for which the groups of cars meet the target."""
+        capacity = CAR_CAPACITY * self.stack_size * trains
+        dock = DOCK_DURATION * trains
+        # Fastest groups are filled first.
+        fills = [dock + capacity / rate for rate, _ in reversed(self.groups)]
+        bounds = [dock] + fills + [math.inf]
+        for filled in range(len(self.groups) + 1):
+            partial = self.groups[: len(self.groups) - filled]
+            full = self.groups[len(self.groups) - filled :]
+            a = sum(rate * cars for rate, cars in partial)
+            c = capacity * sum(cars for _, cars in full) - dock * a
+            low, high = bounds[filled], bounds[filled + 1]
+            if c < 0:
+                # Increasing towards `a`.
+                if self.target >= a:
+                    continue
+                rtd = max(c / (self.target - a), low)
+                if rtd <= high:
+                    return max(rtd, DOCK_DURATION)
+            elif a + c / low >= self.target:
+                return max(low, DOCK_DURATION)
+        return None
+
+    def station_rate(self, cars):
+        if self.groups is not None:
+            return sum(rate * cars for rate, cars in self.groups)
+        return self.platform_rate * cars
+
+    def throughput(self, trains, cars, rtd):
+        if self.groups is not None:
+            return (
+                sum(
+                    cars
+                    * min(
+                        rate * (rtd - DOCK_DURATION * trains),
+                        CAR_CAPACITY * self.stack_size * trains,
+                    )
+                    for rate, cars in self.groups
+                )
+                / rtd
+            )
+        partial = self.platform_rate * cars * (rtd - DOCK_DURATION * trains) / rtd
+        full = CAR_CAPACITY * self.stack_size * trains * cars / rtd
+        return min(partial, full)
+
+    def feasible(self):
+        """Yields the `(trains, cars, rtd, throughput)` of every solution."""
+        for trains in self.trains:
+            for cars in self.cars:
+                rtd = self.rtd(trains, cars)
+                if rtd is None:
+                    continue
+                if self.args.rtd is None and self.target is not None:
+                    # Exactly the target by construction, avoiding rounding.
+                    throughput = self.target
+                else:
+                    throughput = self.throughput(trains, cars, rtd)
+                if throughput <= 0:
+                    continue
+                if self.target is not None and throughput < self.target:
+                    continue
+                yield trains, cars, rtd, throughput
+
+    def key(self, trains, cars, rtd, throughput):
+        """Lexicographic objective of a solution, smallest is best."""
+        values = {"trains": trains, "cars": cars}
+        key = [values[var] for var in self.minimize]
+        if self.args.rtd is None:
+            key.append(rtd)
+        if self.target is not None:
+            key.append(throughput)
+        elif self.args.rtd is not None:
+            key.append(-throughput)
+        return key
+
+    def solve(self, sensitivity=False):
+        if sensitivity and self.groups is not None:
+            raise ValueError("sensitivity isn't supported with per-platform rates")
+        best = min(self.feasible(), key=lambda c: self.key(*c), default=None)
+        if best is None:
+            return None
+        solution = self.solution(*best)
+        if sensitivity:
+            trains, cars, rtd, _ = best
+            solution["sensitivity"] = Sensitivity(
+                self.stack_size,
+                self.platform_rate,
+                trains,
+                cars,
+                rtd,
+                self.args.source_rate,
+            ).as_dict()
+        return solution
+
+    def solution(self, trains, cars, rtd, throughput):
+        if trains == ABSOLUTE_MAX_TRAINS:
+            print("warning: absolute maximum train limit reached in solver")
+        if cars == ABSOLUTE_MAX_CARS:
+            print("warning: absolute maximum car limit reached in solver")
+
+        if self.args.source_rate is None:
+            fill_rate = drain_rate = throughput
+        else:
+            fill_rate = min(self.args.source_rate, throughput)
+            if self.args.sink_rate is not None:
+                drain_rate = min(self.args.sink_rate, throughput)
+        loaded = fill_rate * rtd / (trains * cars)
+
+        solution = {
+            "info": self.info,
+            "stack_size": self.stack_size,
+            "trains": trains,
+            "cars": cars,
+            "platform_rate": self.platform_rate,
+            "station_rate": self.station_rate(cars),
+            "loaded": loaded,
+            "rtd": rtd,
+            "throughput": throughput,
+            "efficiency": throughput / self.station_rate(cars) * 100,
+        }
+
+        if self.args.source_rate is not None:
+            buffer = Buffer(self.args.source_rate, cars, self.platform_rate)
+            solution |= {
+                "source": {
+                    "rate": self.args.source_rate,
+                    "ratio": self.args.source_rate / throughput,
+                    "buffer": {"size": buffer.size, "time": buffer.time},
+                },
+                "fill_rate": fill_rate,
+            }
+        if self.args.sink_rate is not None:
+            buffer = Buffer(self.args.sink_rate, cars, self.platform_rate)
+            solution |= {
+                "sink": {
+                    "rate": self.args.sink_rate,
+                    "ratio": self.args.sink_rate / fill_rate,
+                    "buffer": {"size": buffer.size, "time": buffer.time},
+                },
+                "drain_rate": drain_rate,
+            }
+
+        if self.groups is None:
+            schedule = Schedule(
+                trains,
+                rtd,
+                loaded,
+                self.platform_rate,
+                is_full(loaded, self.stack_size),
+            )
+        else:
+            platforms = Platforms(
+                self.args.source_platforms,
+                self.args.sink_platforms,
+                self.stack_size,
+                trains,
+                rtd,
+                fill_rate,
+                self.args.source_rate,
+                self.args.sink_rate,
+            )
+            solution["platforms"] = platforms.as_dict()
+            schedule = platforms.schedule(trains, rtd)
+        solution["schedule"] = schedule.as_dict()
+
+        return solution
+
+
+def candidates(fixed, maximum, absolute_maximum):
+    if maximum is not None:
+        absolute_maximum = min(maximum, absolute_maximum)
+    if fixed is not None:
+        return [fixed] if 0 < fixed <= absolute_maximum else []
+    return range(1, absolute_maximum + 1)
@@ -0,0 +1,218 @@
+"""
+Differential testing of the solver backends.
+
+Random, valid `train-solver` arguments are solved by every backend, and the
+solutions are compared field by field within a tolerance. Any disagreement is
+a counterexample, which is then shrunk to the simplest arguments that still
+make the backends disagree.
+"""
+
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from z3 import unknown
+
+from sat_is_factory.train_solver.arguments import get_arguments, join, options
+from sat_is_factory.train_solver.closed_form import ClosedFormSolver
+from sat_is_factory.train_solver.train_solver import Solver
+
+BACKENDS = {
+    "z3": Solver,
+    "closed_form": ClosedFormSolver,
+}
+
+STACK_SIZES = [50, 100, 200, 500]
+BELT_RATES = [60, 120, 270, 480, 780, 1200]
+PIPE_RATES = [300, 600]
+
+REL_TOL = 1e-6
+ABS_TOL = 1e-6
+
+
+def random_argv(rng):
+    argv = []
+    platforms = rng.random() < 0.15
+    if rng.random() < 0.2:
+        argv.append("--fluid")
+        rates = PIPE_RATES
+        if rng.random() < 0.5 and not platforms:
+            argv += ["--platform", str(2 * rng.choice(PIPE_RATES))]
+    else:
+        rates = BELT_RATES
+        argv += ["--stack", str(rng.choice(STACK_SIZES))]
+        if not platforms:
+            argv += ["--platform", str(2 * rng.choice(BELT_RATES))]
+
+    kinds = ["trains", "cars"]
+    if platforms:
+        # Mixed tiers, with one car for each platform.
+        kinds = ["trains"]
+        cars = rng.randint(1, 5)
+        for kind in ["source", "sink"]:
+            if kind == "source" or rng.random() < 0.5:
+                tiers = [str(2 * rng.choice(rates)) for _ in range(cars)]
+                argv += [f"--{kind}-platforms", ",".join(tiers)]
+
+    for kind in kinds:
+        fixed = None
+        if rng.random() < 0.5:
+            fixed = rng.randint(1, 5)
+            argv += [f"--{kind}", str(fixed)]
+        if rng.random() < 0.3:
+            argv += [f"--max-{kind}", str((fixed or 1) + rng.randint(0, 5))]
+    if rng.random() < 0.3:
+        argv += ["--minimize", rng.choice(["cars", "trains"])]
+
+    if rng.random() < 0.6:
+        argv += ["--rtd", f"{rng.uniform(0.5, 15):.2f}"]
+    io = rng.random()
+    if io < 0.25:
+        argv += ["--throughput", f"{rng.uniform(10, 5000):.1f}"]
+    elif io < 0.5:
+        argv += ["--source", f"{rng.uniform(10, 3000):.1f}"]
+        if rng.random() < 0.5:
+            argv += ["--sink", f"{rng.uniform(10, 3000):.1f}"]
+    elif io < 0.6:
+        argv += ["--sink", f"{rng.uniform(10, 3000):.1f}"]
+    return argv
+
+
+def run(backend, argv, timeout=None):
+    """
+    Solves the arguments with one backend, returning a `(status, value)` pair
+    with a status of "solution", "error" or "unknown", when z3 couldn't decide
+    (e.g. it timed out).
+    """
+    args = get_arguments(argv)
+    try:
+        solver = BACKENDS[backend](args)
+        if timeout is not None and hasattr(solver, "opt"):
+            solver.opt.set(timeout=int(timeout * 1000))
+        solution = solver.solve()
+    except (ValueError, ArithmeticError) as e:
+        return ("error", str(e))
+    # The reason z3 gives for a timeout varies between versions.
+    if getattr(solver, "result", None) == unknown:
+        return ("unknown", None)
+    return ("solution", solution)
+
+
+def differences(a, b, path=""):
+    """Returns the paths of every value which differs between a and b."""
+    if isinstance(a, dict) and isinstance(b, dict):
+        result = []
+        for key in sorted(a.keys() | b.keys()):
+            if key in a and key in b:
+                result += differences(a[key], b[key], f"{path}.{key}")
+            else:
+                result.append(f"{path}.{key}")
+        return result
+    elif isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        if len(a) != len(b):
+            return [path]
+        result = []
+        for i, (x, y) in enumerate(zip(a, b)):
+            result += differences(x, y, f"{path}[{i}]")
+        return result
+    elif (
+        isinstance(a, (int, float))
+        and isinstance(b, (int, float))
+        and not isinstance(a, bool)
+        and not isinstance(b, bool)
+    ):
+        if math.isclose(a, b, rel_tol=REL_TOL, abs_tol=ABS_TOL):
+            return []
+        return [path]
+    elif a == b:
+        return []
+    else:
+        return [path]
+
+
+def check(argv, backends=None, timeout=None):
+    """
+    Returns the differences between the backends for the given arguments,
+    ignoring any backend which couldn't decide. Arguments rejected by the
+    argument parser have no differences.
+    """
+    try:
+        get_arguments(argv)
+    except SystemExit:
+        return []
+
+    results = {}
+    for backend in backends or BACKENDS:
+        status, value = run(backend, argv, timeout)
+        if status != "unknown":
+            results[backend] = (status, value)
+
+    result = []
+    if results:
+        first, (status, value) = next(iter(results.items()))
+        for backend, (other_status, other_value) in results.items():
+            if other_status != status:
+                result.append(f"{first} {status} != {backend} {other_status}")
+            elif status == "error":
+                continue
+            else:
+                for path in differences(value, other_value):
+                    result.append(f"{first} != {backend} at {path}")
+    return result
+
+
+def simplifications(argv):
+    """Yields simpler variations of the arguments, simplest first."""
+    pairs = options(argv)
+
+    for i in range(len(pairs)):
+        yield join(pairs[:i] + pairs[i + 1 :])
+
+    for i, (flag, value) in enumerate(pairs):
+        if value is None:
+            continue
+        try:
+            number = float(value)
+        except ValueError:
+            continue
+        for simpler in [1, round(number), round(number, 1), number / 2]:
+            if 0 < simpler < number:
+                if float(simpler).is_integer():
+                    simpler = int(simpler)
+                yield join(pairs[:i] + [(flag, str(simpler))] + pairs[i + 1 :])
+
+
+def shrink(argv, backends=None, timeout=None):
+    """Greedily simplifies failing arguments for as long as they still fail."""
+    changed = True
+    while changed:
+        changed = False
+        for candidate in simplifications(argv):
+            if check(candidate, backends, timeout):
+                argv = candidate
+                changed = True
+                break
+    return argv
+
+
+def fuzz(count, seed=None, jobs=None, backends=None, timeout=None):
+    """
+    Checks `count` random scenarios across the CPU cores, returning a list of
+    shrunk counterexamples. Failures which don't fail again once shrunk (e.g. a
+    backend only timed out the first time) are dropped.
+    """
+    rng = random.Random(seed)
+    scenarios = [random_argv(rng) for _ in range(count)]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(check, scenarios, repeat(backends), repeat(timeout))
+        failures = [argv for argv, result in zip(scenarios, results) if result]
+        shrunk = list(executor.map(shrink, failures, repeat(backends), repeat(timeout)))
+        results = executor.map(check, shrunk, repeat(backends), repeat(timeout))
+
+        return [
+            {"argv": argv, "original": original, "differences": result}
+            for original, argv, result in zip(failures, shrunk, results)
+            if result
+        ]
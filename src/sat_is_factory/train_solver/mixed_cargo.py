@@ -0,0 +1,156 @@
+from z3 import Implies, Int, Optimize, Sum, sat
+
+from sat_is_factory.train_solver.train_solver import (
+    ABSOLUTE_MAX_CARS,
+    ABSOLUTE_MAX_TRAINS,
+    CAR_CAPACITY,
+    DOCK_DURATION,
+    Schedule,
+    is_full,
+)
+from sat_is_factory.z3_ext import z3_to_python
+
+
+def car_rate(stack_size, platform_rate, trains, rtd):
+    """Throughput of a single car on a route with the given number of trains."""
+    partial = platform_rate * (rtd - DOCK_DURATION * trains) / rtd
+    full = CAR_CAPACITY * stack_size * trains / rtd
+    return min(partial, full)
+
+
+class MixedCargoSolver:
+    """
+    Assigns the cars of every train on a route to several items, each with its
+    own stack size and required rate.
+
+    Cars are modeled as one integer count per item rather than one variable per
+    car, so the encoding grows linearly with the number of items and cars of
+    the same item are interchangeable by construction (no permutation symmetry
+    for the optimizer to explore). The number of trains is matched against
+    each allowed value, which keeps every rate constraint linear.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.setup()
+        self.optimize()
+
+    def setup(self):
+        self.trains = Int("trains")
+        self.item_cars = [Int(f"cars_{item}") for item, _, _ in self.args.cargo]
+        self.cars = Sum(self.item_cars)
+
+    def optimize(self):
+        self.opt = Optimize()
+        self.optimize_train()
+        self.optimize_cargo()
+
+    def optimize_train(self):
+        if self.args.rtd is None or self.args.rtd <= DOCK_DURATION:
+            raise ValueError("invalid rtd")
+
+        self.max_trains = ABSOLUTE_MAX_TRAINS
+        if self.args.max_trains is not None:
+            self.max_trains = min(self.max_trains, self.args.max_trains)
+        if self.args.trains is not None:
+            if self.args.trains > self.max_trains:
+                raise ValueError("invalid --trains and --max-trains arguments")
+            self.opt.add(self.trains == self.args.trains)
+        self.opt.add(self.trains > 0)
+        self.opt.add(self.trains <= self.max_trains)
+
+        self.opt.add(self.cars <= ABSOLUTE_MAX_CARS)
+        if (
+            self.args.max_cars
+            and self.args.cars
+            and self.args.max_cars < self.args.cars
+        ):
+            raise ValueError("invalid --cars and --max-cars arguments")
+        if self.args.max_cars is not None:
+            self.opt.add(self.cars <= self.args.max_cars)
+        if self.args.cars is not None:
+            self.opt.add(self.cars == self.args.cars)
+
+        self.info = []
+
+        minimize = ["cars", "trains"]
+        if self.args.minimize is not None:
+            try:
+                minimize.remove(self.args.minimize)
+            except ValueError:
+                raise ValueError(
+                    "invalid minimization priority, must be one of 'cars' or 'trains'"
+                )
+            minimize.insert(0, self.args.minimize)
+
+        for var in minimize:
+            if getattr(self.args, var) is None:
+                self.info.append(f"minimize {var}")
+                self.opt.minimize(getattr(self, var))
+
+    def optimize_cargo(self):
+        for (item, stack_size, rate), cars in zip(self.args.cargo, self.item_cars):
+            if rate <= 0:
+                raise ValueError(f"invalid rate for {item}")
+            self.opt.add(cars > 0)
+            for trains in range(1, self.max_trains + 1):
+                per_car = car_rate(
+                    stack_size, self.args.platform_rate, trains, self.args.rtd
+                )
+                if per_car > 0:
+                    self.opt.add(Implies(self.trains == trains, cars * per_car >= rate))
+                else:
+                    self.opt.add(self.trains != trains)
+        self.info.append(f"{len(self.args.cargo)} cargo items")
+
+    def solve(self):
+        if self.opt.check() == sat:
+            model = self.opt.model()
+
+            trains = z3_to_python(model, self.trains)
+            if trains == ABSOLUTE_MAX_TRAINS:
+                print("warning: absolute maximum train limit reached in solver")
+            if z3_to_python(model, self.cars) == ABSOLUTE_MAX_CARS:
+                print("warning: absolute maximum car limit reached in solver")
+
+            rtd = self.args.rtd
+            platform_rate = self.args.platform_rate
+            cargo = []
+            layout = []
+            for (item, stack_size, rate), item_cars in zip(
+                self.args.cargo, self.item_cars
+            ):
+                cars = z3_to_python(model, item_cars)
+                throughput = cars * car_rate(stack_size, platform_rate, trains, rtd)
+                cargo.append(
+                    {
+                        "item": item,
+                        "stack_size": stack_size,
+                        "rate": rate,
+                        "cars": cars,
+                        "loaded": rate * rtd / (trains * cars),
+                        "throughput": throughput,
+                        "efficiency": throughput / platform_rate / cars * 100,
+                    }
+                )
+                layout += [item] * cars
+
+            # Trains wait on the slowest car to load.
+            schedule = Schedule(
+                trains,
+                rtd,
+                max(item["loaded"] for item in cargo),
+                platform_rate,
+                all(is_full(item["loaded"], item["stack_size"]) for item in cargo),
+            )
+
+            return {
+                "info": self.info,
+                "trains": trains,
+                "cars": len(layout),
+                "platform_rate": platform_rate,
+                "rtd": rtd,
+                "cargo": cargo,
+                "layout": layout,
+                "schedule": schedule.as_dict(),
+            }
@@ -0,0 +1,137 @@
+"""
+Factory-wide train planning from a production graph.
+
+The graph is a JSON document of the form:
+
+    {
+        "defaults": {"rtd": "5:00"},
+        "items": {"water": {"fluid": true}, "screw": {"stack": 500}},
+        "sites": {
+            "mine": {"recipes": [{"count": 2, "outputs": {"iron_ore": 240}}]},
+            "smelter": {
+                "recipes": [
+                    {"count": 8, "inputs": {"iron_ore": 30}, "outputs": {"iron_ingot": 30}}
+                ]
+            }
+        },
+        "routes": {"mine -> smelter": {"rtd": "3:30"}}
+    }
+
+Recipe rates are per building per minute. Each site's net production is shipped
+to the sites consuming it, and every resulting flow becomes a `train-solver`
+scenario with equal --source and --sink rates. Options in "defaults", "items"
+and "routes" are `train-solver` flags without the leading dashes, and are
+applied in that order.
+"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from sat_is_factory.train_solver.buffers import BufferSolver
+from sat_is_factory.train_solver.train_solver import Solver
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def net_rates(site):
+    rates = {}
+    for recipe in site.get("recipes", []):
+        count = recipe.get("count", 1)
+        for item, rate in recipe.get("inputs", {}).items():
+            rates[item] = rates.get(item, 0) - rate * count
+        for item, rate in recipe.get("outputs", {}).items():
+            rates[item] = rates.get(item, 0) + rate * count
+    return rates
+
+
+def flows(graph):
+    """
+    Computes the inter-site item flows of a production graph.
+
+    Each consumer's demand is split between the producers of the item in
+    proportion to their surplus, so that no producer ships more than it makes.
+    """
+    supply = {}
+    demand = {}
+    for name, site in graph["sites"].items():
+        for item, rate in net_rates(site).items():
+            if rate > 0:
+                supply.setdefault(item, {})[name] = rate
+            elif rate < 0:
+                demand.setdefault(item, {})[name] = -rate
+
+    result = []
+    for item, consumers in demand.items():
+        producers = supply.get(item, {})
+        total_supply = sum(producers.values())
+        total_demand = sum(consumers.values())
+        if total_supply < total_demand:
+            raise ValueError(
+                f"not enough {item}, {total_supply}/min produced but {total_demand}/min consumed"
+            )
+        for sink, needed in consumers.items():
+            for source, produced in producers.items():
+                result.append(
+                    {
+                        "source": source,
+                        "sink": sink,
+                        "item": item,
+                        "rate": needed * produced / total_supply,
+                    }
+                )
+    return result
+
+
+def route_name(flow):
+    return f"{flow['source']} -> {flow['sink']}"
+
+
+def scenario(graph, flow):
+    """Returns the `train-solver` command line arguments for a flow."""
+    options = {}
+    options |= graph.get("defaults", {})
+    options |= graph.get("items", {}).get(flow["item"], {})
+    options |= graph.get("routes", {}).get(route_name(flow), {})
+
+    argv = ["--source", str(flow["rate"]), "--sink", str(flow["rate"])]
+    for key, value in options.items():
+        if value is True:
+            argv.append(f"--{key}")
+        elif value is not False and value is not None:
+            argv += [f"--{key}", str(value)]
+    return argv
+
+
+def solve_scenario(args):
+    if args.minimize == "buffers":
+        return BufferSolver(args).solve()
+    return Solver(args).solve()
+
+
+def solve_all(scenarios, jobs=None):
+    """
+    Solves a list of parsed scenario arguments in parallel processes.
+
+    Scenarios with the same route shape (identical arguments) are only solved
+    once, and share their solution.
+    """
+    unique = {}
+    for args in scenarios:
+        unique.setdefault(scenario_key(args), args)
+
+    keys = list(unique)
+    if jobs == 1:
+        solutions = [solve_scenario(unique[key]) for key in keys]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            solutions = list(executor.map(solve_scenario, [unique[k] for k in keys]))
+
+    memo = dict(zip(keys, solutions))
+    return [memo[scenario_key(args)] for args in scenarios]
+
+
+def scenario_key(args):
+    return repr(sorted(vars(args).items()))
@@ -0,0 +1,180 @@
+"""
+Races solver strategies against each other.
+
+The time z3 takes varies by orders of magnitude with the shape of the query
+(optimal, maximizing or minimizing throughput, with or without a source and
+sink), and no one configuration is the fastest for all of them. Each strategy
+in `STRATEGIES` runs in its own process, the first to prove an answer wins and
+the others are terminated. Strategies which give up (e.g. z3 returning unknown
+for an engine that's incomplete for nonlinear arithmetic) simply lose.
+
+The winner is recorded for the shape of the query in a JSON cache, so later
+queries of the same shape run only the winner, racing again only if it can't
+prove an answer.
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import re
+
+from z3 import Optimize, unknown
+
+from sat_is_factory.train_solver.closed_form import ClosedFormSolver
+from sat_is_factory.train_solver.train_solver import Solver
+
+CACHE = os.path.join(
+    os.path.expanduser("~"), ".cache", "sat_is_factory", "portfolio.json"
+)
+
+# Backend and z3 optimizer parameters of each strategy.
+STRATEGIES = {
+    "z3": (Solver, {}),
+    "z3_symba": (Solver, {"optsmt_engine": "symba"}),
+    "z3_nlsat": (Solver, {"optsmt_nlsat": True}),
+    "z3_no_grobner": (Solver, {"arith.nl.grobner": False}),
+    "closed_form": (ClosedFormSolver, {}),
+}
+
+# Seconds between checks for strategies which died without an answer.
+POLL = 0.1
+
+
+def available(strategies=None):
+    """Names of the strategies with parameters supported by the installed z3."""
+    descriptions = Optimize().param_descrs()
+    parameters = {descriptions.get_name(i) for i in range(descriptions.size())}
+    return [
+        name
+        for name in strategies or STRATEGIES
+        if set(STRATEGIES[name][1]) <= parameters
+    ]
+
+
+def shape(args):
+    """
+    The shape of a query, which is the info of its model without any numbers,
+    and whether it has a source, sink and per-platform rates. Raises ValueError
+    for invalid arguments, like the solvers.
+    """
+    info = [re.sub(r"\d+(\.\d+)?", "#", line) for line in Solver(args).info]
+    if args.source_rate is not None:
+        info.append("source")
+    if args.sink_rate is not None:
+        info.append("sink")
+    if args.source_platforms is not None:
+        info.append("platforms")
+    return ", ".join(info)
+
+
+def run(name, args, timeout=None, sensitivity=False):
+    """
+    Solves the arguments with one strategy, returning a `(status, value)` pair
+    with a status of "solution", "error" or "unknown".
+    """
+    backend, parameters = STRATEGIES[name]
+    try:
+        solver = backend(args)
+        if hasattr(solver, "opt"):
+            for key, value in parameters.items():
+                solver.opt.set(key, value)
+            if timeout is not None:
+                solver.opt.set(timeout=int(timeout * 1000))
+        solution = solver.solve(sensitivity=sensitivity)
+    except ValueError as e:
+        return ("error", e)
+    if getattr(solver, "result", None) == unknown:
+        return ("unknown", solver.opt.reason_unknown())
+    return ("solution", solution)
+
+
+def attempt(name, args, timeout, sensitivity, results):
+    try:
+        status, value = run(name, args, timeout, sensitivity)
+    except Exception as e:
+        # A crashed strategy loses, without stopping the race.
+        status, value = "unknown", repr(e)
+    results.put((name, status, value))
+
+
+def race(args, strategies=None, timeout=None, sensitivity=False):
+    """
+    Runs the strategies in parallel processes, returning the `(name, status,
+    value)` of the first to prove an answer, or a name of None if none did.
+    """
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=attempt,
+            args=(name, args, timeout, sensitivity, results),
+            daemon=True,
+        )
+        for name in available(strategies)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        pending = len(processes)
+        while pending:
+            try:
+                name, status, value = results.get(timeout=POLL)
+            except queue.Empty:
+                if any(p.is_alive() for p in processes) or not results.empty():
+                    continue
+                break
+            pending -= 1
+            if status != "unknown":
+                return name, status, value
+        return None, "unknown", None
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+def load(cache):
+    """Reads the winners of each query shape, ignoring a missing or bad cache."""
+    try:
+        with open(cache) as file:
+            winners = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return winners if isinstance(winners, dict) else {}
+
+
+def save(cache, winners):
+    os.makedirs(os.path.dirname(os.path.abspath(cache)), exist_ok=True)
+    temporary = f"{cache}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(winners, file, indent=2, sort_keys=True)
+    os.replace(temporary, cache)
+
+
+def solve(args, cache=CACHE, strategies=None, timeout=None, sensitivity=False):
+    """
+    Solves with the cached winner for the shape of the query, otherwise by
+    racing the strategies, returning the `(strategy, solution)`. The strategy
+    is None when no strategy proved an answer. Raises ValueError for invalid
+    arguments, like the solvers.
+    """
+    key = shape(args)
+    names = available(strategies)
+    winners = load(cache) if cache is not None else {}
+
+    name = winners.get(key)
+    status, value = "unknown", None
+    if name in names:
+        status, value = run(name, args, timeout, sensitivity)
+    if status == "unknown":
+        name, status, value = race(args, names, timeout, sensitivity)
+        if name is not None and cache is not None:
+            winners = load(cache)
+            winners[key] = name
+            save(cache, winners)
+
+    if status == "error":
+        raise value
+    return name, value
@@ -0,0 +1,290 @@
+"""
+Extracts the train routes of a save file as `train-solver` scenarios.
+
+Save files are a header followed by zlib compressed chunks of at most 128 KiB.
+The file is memory mapped, and chunks are decompressed by a pool of threads
+(zlib releases the GIL) with a bounded number of chunks in flight, so memory
+use doesn't grow with the size of the save.
+
+The decompressed body is an int64 size followed by object records, each a
+class path, an instance name, an int32 size and then that many bytes of
+tagged properties (name, type, size, index, type specific header and value,
+terminated by "None"). Only the records of the classes in `CLASSES` are
+parsed, all others are skipped by size. The properties read are:
+
+- stations: `mStationName`
+- platforms: `mStation` (the station it's attached to) and `mPlatformRate`
+  (the rate of the belts or pipes connected to it)
+- trains: `mStops` (the stations of its timetable) and `mNumCars`
+"""
+
+import mmap
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from os import cpu_count
+
+PACKAGE_FILE_TAG = 0x9E2A83C1
+ARCHIVE_V2_HEADER = 0x22222222
+ZLIB = 3
+
+STATION = "/Game/FactoryGame/Buildable/Factory/Train/Station/Build_TrainStation.Build_TrainStation_C"
+PLATFORM = "/Game/FactoryGame/Buildable/Factory/Train/Station/Build_TrainDockingStation.Build_TrainDockingStation_C"
+FLUID_PLATFORM = "/Game/FactoryGame/Buildable/Factory/Train/Station/Build_TrainDockingStationLiquid.Build_TrainDockingStationLiquid_C"
+TRAIN = "/Script/FactoryGame.FGTrain"
+
+CLASSES = [STATION, PLATFORM, FLUID_PLATFORM, TRAIN]
+
+# Property types with values which are read, all others are skipped.
+VALUE_TYPES = ["IntProperty", "FloatProperty", "StrProperty", "ObjectProperty"]
+
+
+def chunk_headers(data):
+    """
+    Yields the `(offset, compressed size, uncompressed size)` of each chunk,
+    where offset is the start of its compressed data.
+    """
+    tag = struct.pack("<I", PACKAGE_FILE_TAG)
+    offset = data.find(tag)
+    if offset < 0:
+        raise ValueError("no compressed chunks found in save")
+
+    while offset < len(data):
+        if offset + 49 > len(data):
+            raise ValueError(f"truncated chunk header at {offset}")
+        magic, version = struct.unpack_from("<II", data, offset)
+        if magic != PACKAGE_FILE_TAG:
+            raise ValueError(f"invalid chunk header at {offset}")
+        if version == ARCHIVE_V2_HEADER:
+            (algorithm,) = struct.unpack_from("<B", data, offset + 16)
+            if algorithm != ZLIB:
+                raise ValueError(f"unsupported compression at {offset}")
+            offset += 17
+        else:
+            offset += 16
+        compressed, uncompressed, _, _ = struct.unpack_from("<qqqq", data, offset)
+        offset += 32
+        if offset + compressed > len(data):
+            raise ValueError(f"truncated chunk at {offset}")
+        yield offset, compressed, uncompressed
+        offset += compressed
+
+
+def decompress(data, offset, compressed, uncompressed):
+    chunk = zlib.decompress(data[offset : offset + compressed])
+    if len(chunk) != uncompressed:
+        raise ValueError(f"invalid chunk size at {offset}")
+    return chunk
+
+
+def chunks(data, jobs=None, window=None):
+    """
+    Yields the decompressed chunks in order, decompressing up to `window`
+    chunks ahead on `jobs` threads.
+    """
+    jobs = jobs or cpu_count() or 1
+    window = window or 2 * jobs
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = []
+        for header in chunk_headers(data):
+            pending.append(executor.submit(decompress, data, *header))
+            if len(pending) >= window:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+class Reader:
+    """Reads little endian values from a stream of byte chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = b""
+        self.position = 0
+
+    def available(self):
+        return len(self.buffer) - self.position
+
+    def fill(self, size):
+        parts = [self.buffer[self.position :]]
+        available = len(parts[0])
+        while available < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                raise EOFError("unexpected end of save")
+            parts.append(chunk)
+            available += len(chunk)
+        self.buffer = b"".join(parts)
+        self.position = 0
+
+    def at_end(self):
+        try:
+            self.fill(1)
+            return False
+        except EOFError:
+            return True
+
+    def read(self, size):
+        if self.available() < size:
+            self.fill(size)
+        data = self.buffer[self.position : self.position + size]
+        self.position += size
+        return data
+
+    def skip(self, size):
+        """Skips bytes without holding on to the chunks they span."""
+        while size > self.available():
+            size -= self.available()
+            self.buffer = next(self.chunks, None)
+            self.position = 0
+            if self.buffer is None:
+                raise EOFError("unexpected end of save")
+        self.position += size
+
+    def unpack(self, format):
+        return struct.unpack(format, self.read(struct.calcsize(format)))[0]
+
+    def int32(self):
+        return self.unpack("<i")
+
+    def int64(self):
+        return self.unpack("<q")
+
+    def uint8(self):
+        return self.unpack("<B")
+
+    def float(self):
+        return self.unpack("<f")
+
+    def fstring(self):
+        length = self.int32()
+        if length == 0:
+            return ""
+        elif length > 0:
+            return self.read(length)[:-1].decode("latin-1")
+        else:
+            return self.read(-length * 2)[:-2].decode("utf-16-le")
+
+
+def read_guid(reader):
+    if reader.uint8():
+        reader.skip(16)
+
+
+def read_value(reader, kind):
+    if kind == "IntProperty":
+        return reader.int32()
+    elif kind == "FloatProperty":
+        return reader.float()
+    elif kind == "StrProperty":
+        return reader.fstring()
+    elif kind == "ObjectProperty":
+        reader.fstring()  # Level name.
+        return reader.fstring()
+
+
+def read_properties(reader):
+    properties = {}
+    while True:
+        name = reader.fstring()
+        if name == "None":
+            return properties
+        kind = reader.fstring()
+        size = reader.int32()
+        reader.int32()  # Array index.
+
+        if kind == "BoolProperty":
+            properties[name] = reader.uint8() != 0
+            read_guid(reader)
+        elif kind == "ArrayProperty":
+            inner = reader.fstring()
+            read_guid(reader)
+            if inner in VALUE_TYPES:
+                count = reader.int32()
+                properties[name] = [read_value(reader, inner) for _ in range(count)]
+            else:
+                reader.skip(size)
+        else:
+            read_guid(reader)
+            if kind in VALUE_TYPES:
+                properties[name] = read_value(reader, kind)
+            else:
+                reader.skip(size)
+
+
+def objects(path, classes=CLASSES, jobs=None):
+    """Yields `(class path, instance name, properties)` of the wanted objects."""
+    with open(path, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            reader = Reader(chunks(data, jobs))
+            reader.int64()  # Body size.
+            while not reader.at_end():
+                class_path = reader.fstring()
+                instance = reader.fstring()
+                size = reader.int32()
+                if class_path in classes:
+                    yield class_path, instance, read_properties(reader)
+                else:
+                    reader.skip(size)
+
+
+def routes(path, jobs=None):
+    """
+    Groups the trains of a save by their timetable. Each route is loaded at its
+    first stop and unloaded at its second.
+    """
+    stations = {}
+    platforms = {}
+    trains = []
+    for class_path, instance, properties in objects(path, jobs=jobs):
+        if class_path == STATION:
+            stations[instance] = properties.get("mStationName", instance)
+        elif class_path in [PLATFORM, FLUID_PLATFORM]:
+            platforms.setdefault(properties.get("mStation"), []).append(
+                {
+                    "rate": properties.get("mPlatformRate"),
+                    "fluid": class_path == FLUID_PLATFORM,
+                }
+            )
+        elif class_path == TRAIN:
+            trains.append(properties)
+
+    result = {}
+    for train in trains:
+        stops = tuple(train.get("mStops", []))
+        if len(stops) < 2:
+            continue
+        if stops not in result:
+            source = platforms.get(stops[0], [])
+            rates = [p["rate"] for p in source if p["rate"] is not None]
+            result[stops] = {
+                "stops": [stations.get(stop, stop) for stop in stops],
+                "trains": 0,
+                "cars": 0,
+                "platforms": len(source),
+                "platform_rate": min(rates) if rates else None,
+                "fluid": any(p["fluid"] for p in source),
+            }
+        route = result[stops]
+        route["trains"] += 1
+        route["cars"] = max(route["cars"], train.get("mNumCars", 1))
+    return list(result.values())
+
+
+def scenario(route):
+    """Returns the `train-solver` command line arguments for a route."""
+    argv = [
+        "--trains",
+        str(route["trains"]),
+        "--max-trains",
+        str(route["trains"]),
+        "--cars",
+        str(route["cars"]),
+        "--max-cars",
+        str(route["cars"]),
+    ]
+    if route["platform_rate"] is not None:
+        argv += ["--platform", str(round(route["platform_rate"]))]
+    if route["fluid"]:
+        argv.append("--fluid")
+    return argv
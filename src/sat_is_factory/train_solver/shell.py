@@ -0,0 +1,191 @@
+"""
+Interactive `train-solver` session.
+
+Starts from the given `train-solver` arguments, and re-solves whenever they
+are changed. Rapid edits are batched together, and an edit made while a solve
+is still running cancels it.
+
+Commands:
+
+    set FLAG [VALUE] ...   change arguments, e.g. `set rtd 5:00 cars 2`
+    unset FLAG ...         remove arguments, e.g. `unset throughput`
+    show                   print the current arguments
+    quit                   leave the session
+
+A line starting with a flag name is the same as `set`, e.g. `rtd 4:30`.
+"""
+
+import cmd
+import threading
+import time
+
+from sat_is_factory.train_solver.arguments import (
+    SWITCHES,
+    get_arguments,
+    join,
+    options,
+)
+from sat_is_factory.train_solver.train_solver import Solver
+
+# Seconds to wait for more edits before solving.
+DEBOUNCE = 0.2
+
+
+class Session:
+    """
+    Solves the latest arguments in a background thread, with one `Solver`
+    (and z3 optimizer) updated in place for every edit.
+    """
+
+    def __init__(self, argv, report, debounce=DEBOUNCE):
+        self.options = dict(options(argv))
+        self.args = get_arguments(join(self.options.items()))
+        self.report = report
+        self.debounce = debounce
+
+        self.solver = None
+        self.condition = threading.Condition()
+        self.version = 1
+        self.solved = 0
+        self.edited = time.monotonic()
+        self.busy = False
+        self.closed = False
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def edit(self, changes):
+        """
+        Applies a dict of flag changes, where a value of False removes the
+        flag. Raises SystemExit, leaving the arguments unchanged, if the new
+        arguments are invalid.
+        """
+        options = dict(self.options)
+        for flag, value in changes.items():
+            if value is False:
+                options.pop(flag, None)
+            else:
+                options[flag] = value
+        args = get_arguments(join(options.items()))
+
+        with self.condition:
+            self.options = options
+            self.args = args
+            self.version += 1
+            self.edited = time.monotonic()
+            if self.busy and self.solver is not None:
+                self.solver.opt.ctx.interrupt()
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.closed and self.solved == self.version:
+                    self.condition.wait()
+                # Wait for the edits to settle.
+                while not self.closed:
+                    remaining = self.edited + self.debounce - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if self.closed:
+                    return
+                version = self.version
+                args = self.args
+                self.busy = True
+
+            start = time.perf_counter()
+            error = solution = None
+            try:
+                if self.solver is None:
+                    self.solver = Solver(args)
+                else:
+                    self.solver.update(args)
+                solution = self.solver.solve()
+            except ValueError as e:
+                error = e
+            latency = time.perf_counter() - start
+
+            with self.condition:
+                self.busy = False
+                self.solved = version
+                stale = self.closed or version != self.version
+                self.condition.notify_all()
+            if not stale:
+                self.report(args, solution, latency, error)
+
+    def wait(self):
+        """Blocks until the latest arguments are solved."""
+        with self.condition:
+            while self.busy or self.solved != self.version:
+                self.condition.wait()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            if self.busy and self.solver is not None:
+                self.solver.opt.ctx.interrupt()
+            self.condition.notify_all()
+        self.thread.join()
+
+
+class Shell(cmd.Cmd):
+    intro = "Type `help` for a list of commands."
+    prompt = "train-solver> "
+
+    def __init__(self, argv, report, debounce=DEBOUNCE):
+        super().__init__()
+        self.report = report
+
+        def report_with_prompt(*args):
+            self.report(*args)
+            print(self.prompt, end="", flush=True)
+
+        self.session = Session(argv, report_with_prompt, debounce)
+
+    def do_set(self, line):
+        """set FLAG [VALUE] ...: change arguments, e.g. `set rtd 5:00 cars 2`"""
+        changes = {}
+        words = line.split()
+        while words:
+            flag = f"--{words.pop(0).removeprefix('--')}"
+            if flag in SWITCHES:
+                changes[flag] = None
+            elif words:
+                changes[flag] = words.pop(0)
+            else:
+                print(f"missing value for {flag}")
+                return
+        self.edit(changes)
+
+    def do_unset(self, line):
+        """unset FLAG ...: remove arguments, e.g. `unset throughput`"""
+        self.edit({f"--{flag.removeprefix('--')}": False for flag in line.split()})
+
+    def do_show(self, line):
+        """show: print the current arguments"""
+        print(" ".join(join(self.session.options.items())))
+
+    def do_quit(self, line):
+        """quit: leave the session"""
+        self.session.close()
+        return True
+
+    def do_EOF(self, line):
+        # Finish solving piped input before leaving.
+        print()
+        self.session.wait()
+        return self.do_quit(line)
+
+    def emptyline(self):
+        pass
+
+    def default(self, line):
+        self.do_set(line)
+
+    def edit(self, changes):
+        try:
+            self.session.edit(changes)
+        except SystemExit:
+            # The argument parser already printed the error.
+            pass
@@ -1,4 +1,6 @@
-from z3 import Int, IntNumRef, Optimize, RatNumRef, Real, sat
+import math
+
+from z3 import Int, IntNumRef, IntVal, Optimize, RatNumRef, Real, Sum, sat
 
 from sat_is_factory.z3_ext import Min
 
@@ -8,10 +10,32 @@ CAR_CAPACITY = 32
 ABSOLUTE_MAX_TRAINS = 50
 ABSOLUTE_MAX_CARS = 50
 
+# Allowed overlap of two dock windows, to absorb floating point error.
+DOCK_TOLERANCE = 1e-9
+
+
+def is_full(loaded, stack_size):
+    capacity = CAR_CAPACITY * stack_size
+    return loaded >= capacity or math.isclose(loaded, capacity)
+
+
+def platform_groups(source, sink):
+    """
+    Groups the cars of a train by the rate of the slower of their source and
+    sink platforms, as `(rate, cars)` pairs sorted by rate, so the model has
+    one term for each distinct rate rather than for each platform.
+    """
+    groups = {}
+    for rate in map(min, source, sink):
+        groups[rate] = groups.get(rate, 0) + 1
+    return sorted(groups.items())
+
 
 class Buffer:
-    def __init__(self, external_rate, cars, platform_rate):
-        self.size = DOCK_DURATION * external_rate / cars
+    def __init__(self, external_rate, cars, platform_rate, idle=DOCK_DURATION):
+        # What each platform gathers (or supplies) while `idle`, and how long
+        # a docked train takes to clear it.
+        self.size = idle * external_rate / cars
         self.time = self.size / (platform_rate - external_rate / cars)
 
 
@@ -22,6 +46,216 @@ class Io:
         self.buffer = Buffer(self.rate, cars, platform_rate)
 
 
+class Schedule:
+    """
+    Evenly spaced schedule for the trains of a route, in minutes.
+
+    Train `k` arrives at each station `k * rtd / trains` after the first train,
+    and stays docked for the docking delay plus the time it takes to load (or
+    unload) `loaded` on each car. Every platform of a station sees the same
+    dock windows, since all cars of a train dock together.
+    """
+
+    def __init__(self, trains, rtd, loaded, platform_rate, full):
+        self.headway = rtd / trains
+        self.full = full
+        self.wait = loaded / platform_rate
+        self.windows = [
+            (k * self.headway, k * self.headway + DOCK_DURATION + self.wait)
+            for k in range(trains)
+        ]
+        self.departures = [end for _, end in self.windows]
+
+        # Each window must end before the next train arrives, and the last
+        # window before the first train arrives again on its next trip.
+        starts = [start for start, _ in self.windows[1:]] + [rtd]
+        self.collisions = [
+            (k, (k + 1) % trains)
+            for k, (start, end) in enumerate(zip(starts, self.departures))
+            if end - start > DOCK_TOLERANCE
+        ]
+
+    def as_dict(self):
+        return {
+            "headway": self.headway,
+            "wait": {"full": self.full, "time": self.wait},
+            "departures": self.departures,
+            "windows": {"source": self.windows, "sink": self.windows},
+            "collisions": self.collisions,
+        }
+
+
+class Platforms:
+    """
+    Per car view of a train with its own rate at each source and sink
+    platform, in minutes.
+
+    Every car of a train is docked for the same time, so cars at faster
+    platforms are filled (or emptied) first, and the train waits for the car
+    which takes the longest. The source and sink rates are split between the
+    platforms in proportion to their rates, for the buffer of each platform
+    which can keep up with its share.
+    """
+
+    def __init__(
+        self,
+        source,
+        sink,
+        stack_size,
+        trains,
+        rtd,
+        fill_rate,
+        source_rate=None,
+        sink_rate=None,
+    ):
+        capacity = CAR_CAPACITY * stack_size
+        throughputs = [
+            min(min(a, b) * (rtd - DOCK_DURATION * trains), capacity * trains) / rtd
+            for a, b in zip(source, sink)
+        ]
+        # A slow source leaves every car with less.
+        scale = min(fill_rate / sum(throughputs), 1)
+
+        self.cars = []
+        for a, b, throughput in zip(source, sink, throughputs):
+            loaded = throughput * scale * rtd / trains
+            potential = min(a, b) * (rtd - DOCK_DURATION * trains) / trains
+            car = {
+                "source": a,
+                "sink": b,
+                "throughput": throughput,
+                "loaded": loaded,
+                "limit": "capacity" if is_full(potential, stack_size) else "platform",
+                "time": {"source": loaded / a, "sink": loaded / b},
+            }
+            buffers = {}
+            stations = {
+                "source": (source_rate, a, sum(source)),
+                "sink": (sink_rate, b, sum(sink)),
+            }
+            for kind, (rate, platform_rate, station_rate) in stations.items():
+                # A share of the platform's rate or more is never cleared, and
+                # the station's buffers would be full (or empty) instead.
+                if rate is None or rate >= station_rate:
+                    continue
+                share = rate * platform_rate / station_rate
+                buffer = Buffer(share, 1, platform_rate)
+                buffers[kind] = {"size": buffer.size, "time": buffer.time}
+            if buffers:
+                car["buffer"] = buffers
+            self.cars.append(car)
+
+        # The first of the slowest cars, ignoring rounding differences.
+        times = [max(car["time"].values()) for car in self.cars]
+        self.bottleneck = next(
+            i for i, time in enumerate(times) if math.isclose(time, max(times))
+        )
+        self.full = all(is_full(car["loaded"], stack_size) for car in self.cars)
+
+    def schedule(self, trains, rtd):
+        """Schedule of the train, waiting for its slowest car."""
+        car = self.cars[self.bottleneck]
+        rate = min(car["source"], car["sink"])
+        return Schedule(trains, rtd, car["loaded"], rate, self.full)
+
+    def as_dict(self):
+        return {"cars": self.cars, "bottleneck": self.bottleneck}
+
+
+class Sensitivity:
+    """
+    How the throughput, efficiency and loaded amount of a solution respond to
+    its rtd, trains and cars, evaluated from the train equations without
+    solving again.
+
+    The regime is "platform" when trains leave partially loaded (the partial
+    equation binds), "capacity" when they leave full, or "balanced" when both
+    meet. Derivatives are per second of rtd, towards a shorter rtd where the
+    equations meet. Deltas are exact, for one more or one less train or car,
+    and a 10 second shorter rtd, or None when that leaves no throughput.
+    """
+
+    def __init__(
+        self,
+        stack_size,
+        platform_rate,
+        trains,
+        cars,
+        rtd,
+        source_rate=None,
+        rtd_delta=10 / 60,
+    ):
+        self.stack_size = stack_size
+        self.platform_rate = platform_rate
+        self.source_rate = source_rate
+
+        partial = platform_rate * cars * (rtd - DOCK_DURATION * trains) / rtd
+        full = CAR_CAPACITY * stack_size * trains * cars / rtd
+        if math.isclose(partial, full):
+            self.regime = "balanced"
+        elif partial < full:
+            self.regime = "platform"
+        else:
+            self.regime = "capacity"
+
+        if self.regime == "capacity":
+            throughput = full
+            d_throughput = -CAR_CAPACITY * stack_size * trains * cars / rtd**2
+        else:
+            throughput = partial
+            d_throughput = platform_rate * cars * DOCK_DURATION * trains / rtd**2
+        if source_rate is not None and source_rate < throughput:
+            fill_rate, d_fill_rate = source_rate, 0
+        else:
+            fill_rate, d_fill_rate = throughput, d_throughput
+        d_loaded = (fill_rate + rtd * d_fill_rate) / (trains * cars)
+        self.derivatives = {
+            "throughput": d_throughput / 60,
+            "efficiency": d_throughput / platform_rate / cars * 100 / 60,
+            "loaded": d_loaded / 60,
+        }
+
+        base = self.evaluate(trains, cars, rtd)
+        variations = {
+            "trains+1": (trains + 1, cars, rtd),
+            "trains-1": (trains - 1, cars, rtd),
+            "cars+1": (trains, cars + 1, rtd),
+            "cars-1": (trains, cars - 1, rtd),
+            "rtd-10s": (trains, cars, rtd - rtd_delta),
+        }
+        self.deltas = {}
+        for name, variation in variations.items():
+            values = self.evaluate(*variation)
+            if values is None or base is None:
+                self.deltas[name] = None
+            else:
+                self.deltas[name] = {k: values[k] - base[k] for k in base}
+
+    def evaluate(self, trains, cars, rtd):
+        if trains < 1 or cars < 1 or rtd <= DOCK_DURATION:
+            return None
+        partial = self.platform_rate * cars * (rtd - DOCK_DURATION * trains) / rtd
+        full = CAR_CAPACITY * self.stack_size * trains * cars / rtd
+        throughput = min(partial, full)
+        if throughput <= 0:
+            return None
+        fill_rate = throughput
+        if self.source_rate is not None:
+            fill_rate = min(self.source_rate, throughput)
+        return {
+            "throughput": throughput,
+            "efficiency": throughput / self.platform_rate / cars * 100,
+            "loaded": fill_rate * rtd / (trains * cars),
+        }
+
+    def as_dict(self):
+        return {
+            "regime": self.regime,
+            "derivatives": self.derivatives,
+            "deltas": self.deltas,
+        }
+
+
 class Solver:
     def __init__(self, args):
         self.args = args
@@ -35,7 +269,6 @@ class Solver:
         self.cars = Int("cars")
 
         self.platform_rate = Int("platform_rate")
-        self.station_rate = self.platform_rate * self.cars
 
         self.rtd = Real("rtd")
 
@@ -47,8 +280,29 @@ class Solver:
             / self.rtd
         )
         self.full = CAR_CAPACITY * self.stack_size * self.trains * self.cars / self.rtd
-        self.throughput = Min(self.partial, self.full)
-        self.efficiency = self.throughput / self.platform_rate / self.cars * 100
+        if self.args.source_platforms is None:
+            self.station_rate = self.platform_rate * self.cars
+            self.throughput = Min(self.partial, self.full)
+            self.efficiency = self.throughput / self.platform_rate / self.cars * 100
+        else:
+            # The platform rate is the slowest platform's, so `partial` meets
+            # `full` when every car is filled. The throughput has one term for
+            # each group of cars with the same rate.
+            groups = platform_groups(
+                self.args.source_platforms, self.args.sink_platforms
+            )
+            self.station_rate = IntVal(sum(rate * cars for rate, cars in groups))
+            self.throughput = Sum(
+                [
+                    cars
+                    * Min(
+                        rate * (self.rtd - DOCK_DURATION * self.trains) / self.rtd,
+                        CAR_CAPACITY * self.stack_size * self.trains / self.rtd,
+                    )
+                    for rate, cars in groups
+                ]
+            )
+            self.efficiency = self.throughput / self.station_rate * 100
 
         def loaded(fill_rate):
             return
@@ -61,10 +315,28 @@ class Solver:
             self.sink = Io("sink", self.fill_rate, self.cars, self.platform_rate)
             self.drain_rate = Min(self.sink.rate, self.throughput)
 
-        self.loaded = self.fill_rate * self.rtd / (self.trains * self.cars)  # pyright: ignore[reportOperatorIssue]
+        self.loaded = (
+            self.fill_rate * self.rtd / (self.trains * self.cars)
+        )  # pyright: ignore[reportOperatorIssue]
 
     def optimize(self):
         self.opt = Optimize()
+        self.optimize_arguments()
+
+    def update(self, args):
+        """
+        Replaces the arguments of the model, keeping the same optimizer for
+        incremental solving.
+        """
+        self.args = args
+        self.setup()
+        self.opt.pop()
+        self.optimize_arguments()
+
+    def optimize_arguments(self):
+        # Everything depending on the arguments goes in its own scope, so that
+        # `update` can replace it.
+        self.opt.push()
         self.optimize_train()
         self.optimize_station()
         if self.args.source_rate or self.args.sink_rate:
@@ -114,7 +386,7 @@ class Solver:
                 minimize.remove(self.args.minimize)
             except ValueError:
                 raise ValueError(
-                    "invalid minimization priority, must be one of 'cars' or 'trains'"
+                    "invalid minimization priority, must be one of 'cars', 'trains' or 'buffers'"
                 )
             minimize.insert(0, self.args.minimize)
 
@@ -167,8 +439,12 @@ class Solver:
         if self.args.sink_rate is not None:
             self.opt.add(self.sink.rate == self.args.sink_rate)
 
-    def solve(self):
-        if self.opt.check() == sat:
+    def solve(self, sensitivity=False):
+        if sensitivity and self.args.source_platforms is not None:
+            raise ValueError("sensitivity isn't supported with per-platform rates")
+        # Kept to tell an unsatisfiable model from an unknown one.
+        self.result = self.opt.check()
+        if self.result == sat:
             model = self.opt.model()
 
             def z3_to_python(expr):
@@ -223,4 +499,37 @@ class Solver:
                     "drain_rate": z3_to_python(self.drain_rate),
                 }
 
+            if self.args.source_platforms is None:
+                schedule = Schedule(
+                    solution["trains"],
+                    solution["rtd"],
+                    solution["loaded"],
+                    solution["platform_rate"],
+                    is_full(solution["loaded"], solution["stack_size"]),
+                )
+            else:
+                platforms = Platforms(
+                    self.args.source_platforms,
+                    self.args.sink_platforms,
+                    solution["stack_size"],
+                    solution["trains"],
+                    solution["rtd"],
+                    z3_to_python(self.fill_rate),
+                    self.args.source_rate,
+                    self.args.sink_rate,
+                )
+                solution["platforms"] = platforms.as_dict()
+                schedule = platforms.schedule(solution["trains"], solution["rtd"])
+            solution["schedule"] = schedule.as_dict()
+
+            if sensitivity:
+                solution["sensitivity"] = Sensitivity(
+                    solution["stack_size"],
+                    solution["platform_rate"],
+                    solution["trains"],
+                    solution["cars"],
+                    solution["rtd"],
+                    self.args.source_rate,
+                ).as_dict()
+
             return solution
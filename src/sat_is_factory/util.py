@@ -11,6 +11,15 @@ def time(str):
         return float(str)
 
 
+def cargo(str):
+    item, stack_size, rate = str.split(":")
+    return item, int(stack_size), float(rate)
+
+
+def rates(str):
+    return [int(rate) for rate in str.split(",")]
+
+
 def fmt_time(minutes):
     m, s = divmod(minutes * 60, 60)
     m, s = int(m), round(s, 2)
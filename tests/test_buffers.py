@@ -0,0 +1,68 @@
+import unittest
+
+from sat_is_factory.train_solver import buffers
+from sat_is_factory.train_solver.arguments import get_arguments
+from sat_is_factory.train_solver.buffers import BufferSolver
+from sat_is_factory.train_solver.closed_form import ClosedFormSolver
+from sat_is_factory.train_solver.train_solver import DOCK_DURATION, Solver
+
+
+class TestBuffers(unittest.TestCase):
+    def test_idle(self):
+        self.assertEqual(buffers.idle(4, 600, 2400), 3)
+        self.assertEqual(buffers.idle(0.5, 2000, 2400), DOCK_DURATION)
+
+    def test_storage(self):
+        self.assertEqual(
+            buffers.storage(4800, 100, False), {"buildings": {}, "capacity": 0}
+        )
+        self.assertEqual(
+            buffers.storage(4801, 100, False),
+            {"buildings": {"industrial storage container": 1}, "capacity": 4800},
+        )
+        self.assertEqual(
+            buffers.storage(2900, 50, True),
+            {"buildings": {"fluid buffer": 2}, "capacity": 800},
+        )
+        self.assertEqual(
+            buffers.storage(7000, 50, True),
+            {"buildings": {"industrial fluid buffer": 2}, "capacity": 4800},
+        )
+
+    def test_solve(self):
+        args = get_arguments(
+            ["--source", "3000", "--rtd", "12", "--minimize", "buffers"]
+        )
+        solver = BufferSolver(args)
+        self.assertEqual(solver.info[0], "minimize buffers")
+        solution = solver.solve()
+        self.assertEqual(solution["trains"], 9)
+        self.assertEqual(solution["cars"], 2)
+        buffer = solution["source"]["buffer"]
+        self.assertAlmostEqual(buffer["size"], 750)
+        self.assertEqual(buffer["storage"]["buildings"], {})
+
+    def test_fewer_trains(self):
+        # Longer headways need larger buffers.
+        sizes = []
+        for trains in range(1, 4):
+            args = get_arguments(
+                ["--source", "1000", "--rtd", "30", "--stack", "50"]
+                + ["--trains", str(trains), "--max-cars", "20", "--minimize", "buffers"]
+            )
+            sizes.append(BufferSolver(args).solve()["source"]["buffer"]["size"])
+        self.assertEqual(sizes, sorted(sizes, reverse=True))
+
+    def test_requires_source(self):
+        with self.assertRaises(ValueError):
+            BufferSolver(get_arguments(["--rtd", "5", "--minimize", "buffers"]))
+
+    def test_invalid_priority(self):
+        args = get_arguments(["--rtd", "5", "--minimize", "foo"])
+        for backend in [Solver, ClosedFormSolver]:
+            with self.assertRaisesRegex(ValueError, "'buffers'"):
+                backend(args)
+
+
+if __name__ == "__main__":
+    unittest.main()
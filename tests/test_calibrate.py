@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+import unittest
+
+from sat_is_factory.train_solver import calibrate
+from sat_is_factory.train_solver.arguments import get_arguments
+from sat_is_factory.train_solver.train_solver import DOCK_DURATION
+
+DOCK = DOCK_DURATION * 60
+
+EVENTS = [
+    ("ore", "t1", "mine", "arrive", 0),
+    ("ore", "t1", "mine", "depart", DOCK + 10),
+    ("ore", "t2", "mine", "arrive", 150),
+    ("ore", "t2", "mine", "depart", 150 + DOCK),
+    ("ore", "t1", "mine", "arrive", 300),
+    ("ore", "t1", "mine", "depart", 300 + DOCK + 20),
+    ("ore", "t2", "mine", "arrive", 460),
+    ("ore", "t1", "mine", "arrive", 600),
+    ("oil", "t3", "well", "arrive", 0),
+    ("oil", "t3", "well", "depart", 2 * DOCK),
+    ("oil", "t3", "well", "arrive", 420),
+]
+
+FIELDS = ["route", "train", "station", "event", "time"]
+
+
+class TestDistribution(unittest.TestCase):
+    def test_statistics(self):
+        distribution = calibrate.Distribution()
+        for value in range(1, 101):
+            distribution.add(value)
+        self.assertEqual(distribution.count, 100)
+        self.assertAlmostEqual(distribution.mean, 50.5)
+        self.assertAlmostEqual(distribution.stdev(), 29.011491975882016)
+        self.assertEqual(distribution.min, 1)
+        self.assertEqual(distribution.max, 100)
+        self.assertAlmostEqual(distribution.quantile(0.5), 50.5, delta=1)
+        self.assertAlmostEqual(distribution.quantile(0.9), 90.5, delta=1)
+
+    def test_single(self):
+        distribution = calibrate.Distribution(resolution=10)
+        distribution.add(42)
+        self.assertEqual(distribution.stdev(), 0)
+        self.assertEqual(distribution.quantile(0.5), 42)
+        self.assertEqual(distribution.as_dict()["median"], 42)
+
+
+class TestCalibrate(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        return path
+
+    def test_formats(self):
+        csv_path = self.write(
+            "log.csv",
+            [",".join(FIELDS)] + [",".join(map(str, event)) for event in EVENTS],
+        )
+        jsonl_path = self.write(
+            "log.jsonl",
+            [json.dumps(dict(zip(FIELDS, event))) for event in EVENTS],
+        )
+        for path in [csv_path, jsonl_path]:
+            routes = calibrate.calibrate(calibrate.events(path))
+            self.assertEqual(routes["ore"]["rtd"].as_dict()["count"], 3)
+            self.assertAlmostEqual(routes["ore"]["rtd"].mean, 303.33333333333333)
+
+    def test_calibrate(self):
+        routes = calibrate.calibrate(dict(zip(FIELDS, event)) for event in EVENTS)
+        self.assertEqual(set(routes), {"ore", "oil"})
+
+        ore = routes["ore"]
+        self.assertEqual(ore["trains"], {"t1", "t2"})
+        self.assertEqual(ore["rtd"].min, 300)
+        self.assertEqual(ore["rtd"].max, 310)
+        self.assertEqual(ore["dock"].count, 3)
+        self.assertAlmostEqual(calibrate.dock_deviation(ore), 0)
+
+        oil = routes["oil"]
+        self.assertEqual(oil["rtd"].mean, 420)
+        self.assertAlmostEqual(calibrate.dock_deviation(oil), 1)
+
+    def test_invalid_event(self):
+        with self.assertRaises(ValueError):
+            calibrate.calibrate(
+                [
+                    {
+                        "route": "ore",
+                        "train": "t1",
+                        "station": "a",
+                        "event": "x",
+                        "time": 0,
+                    }
+                ]
+            )
+
+    def test_scenario(self):
+        routes = calibrate.calibrate(dict(zip(FIELDS, event)) for event in EVENTS)
+        args = get_arguments(calibrate.scenario(routes["oil"]) + ["--cars", "2"])
+        self.assertEqual(args.rtd, 7)
+        self.assertEqual(args.trains, 1)
+        self.assertEqual(args.max_trains, 1)
+        self.assertEqual(args.cars, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
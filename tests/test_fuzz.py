@@ -0,0 +1,83 @@
+import random
+import unittest
+from unittest.mock import patch
+
+from z3 import unknown
+
+from sat_is_factory.train_solver import fuzz
+from sat_is_factory.train_solver.arguments import get_arguments
+from sat_is_factory.train_solver.closed_form import ClosedFormSolver
+from sat_is_factory.train_solver.train_solver import Solver
+
+
+class BrokenSolver(ClosedFormSolver):
+    def solve(self):
+        solution = super().solve()
+        if solution is not None and self.args.rtd is not None:
+            solution["throughput"] += 1
+        return solution
+
+
+class UndecidedSolver(Solver):
+    def solve(self):
+        # As if z3 timed out.
+        self.result = unknown
+
+
+class TestFuzz(unittest.TestCase):
+    def test_random_argv(self):
+        rng = random.Random(0)
+        for _ in range(100):
+            get_arguments(fuzz.random_argv(rng))
+
+    def test_differences(self):
+        a = {"trains": 1, "rtd": 1.0, "schedule": {"departures": [0.5, 1.5]}}
+        b = {"trains": 1, "rtd": 1.0 + 1e-9, "schedule": {"departures": [0.5, 1.6]}}
+        self.assertEqual(fuzz.differences(a, a), [])
+        self.assertEqual(fuzz.differences(a, b), [".schedule.departures[1]"])
+        self.assertEqual(fuzz.differences(a, {"trains": 1}), [".rtd", ".schedule"])
+
+    def test_check(self):
+        for argv in [
+            ["--rtd", "9", "--throughput", "3000"],
+            ["--platform", "960", "--source", "800", "--sink", "600", "--rtd", "5"],
+            ["--stack", "500", "--platform", "1560"],
+            ["--throughput", "1000", "--trains", "2", "--cars", "3"],
+            ["--source-platforms", "2400,1200,1200", "--throughput", "3000"],
+            ["--source-platforms", "2400,960", "--sink-platforms", "1200,2400"],
+        ]:
+            self.assertEqual(fuzz.check(argv), [], argv)
+
+    def test_fuzz(self):
+        # A seed whose scenarios all solve quickly, so no z3 timeout is needed.
+        self.assertEqual(fuzz.fuzz(10, seed=4, jobs=2), [])
+
+    @patch.dict(fuzz.BACKENDS, {"undecided": UndecidedSolver})
+    def test_unknown(self):
+        argv = ["--rtd", "9", "--throughput", "3000"]
+        self.assertEqual(fuzz.run("undecided", argv), ("unknown", None))
+        self.assertEqual(fuzz.check(argv, ["closed_form", "undecided"]), [])
+
+    @patch.dict(fuzz.BACKENDS, {"broken": BrokenSolver})
+    def test_shrink(self):
+        backends = ["closed_form", "broken"]
+        argv = [
+            "--stack",
+            "200",
+            "--platform",
+            "960",
+            "--trains",
+            "2",
+            "--rtd",
+            "7.35",
+            "--throughput",
+            "500.0",
+        ]
+        self.assertEqual(
+            fuzz.check(argv, backends), ["closed_form != broken at .throughput"]
+        )
+        self.assertEqual(fuzz.shrink(argv, backends), ["--rtd", "0.5"])
+
+
+if __name__ == "__main__":
+    unittest.main()
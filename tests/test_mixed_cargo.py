@@ -0,0 +1,106 @@
+import unittest
+
+from sat_is_factory.train_solver import MixedCargoSolver
+from tests.test_train_solver import TestArgs
+
+
+class TestMixedCargo(unittest.TestCase):
+    def test_single_item_matches_solver(self):
+        solver = MixedCargoSolver(
+            TestArgs(
+                {
+                    "cargo": [("iron", 100, 3000)],
+                    "platform_rate": 2400,
+                    "rtd": 9,
+                }
+            )
+        )
+        solution = solver.solve()
+        self.assertIsNotNone(solution)
+        self.assertEqual(solution["trains"], 5)
+        self.assertEqual(solution["cars"], 2)
+        self.assertAlmostEqual(solution["cargo"][0]["throughput"], 3555.5556, places=4)
+
+    def test_multiple_items(self):
+        solver = MixedCargoSolver(
+            TestArgs(
+                {
+                    "cargo": [
+                        ("iron", 100, 1200),
+                        ("copper", 100, 600),
+                        ("screws", 500, 300),
+                    ],
+                    "platform_rate": 2400,
+                    "rtd": 5,
+                }
+            )
+        )
+        solution = solver.solve()
+        self.assertIsNotNone(solution)
+        self.assertEqual(solution["trains"], 2)
+        self.assertEqual(solution["cars"], 3)
+        self.assertEqual(solution["layout"], ["iron", "copper", "screws"])
+        for item in solution["cargo"]:
+            self.assertGreaterEqual(item["throughput"], item["rate"])
+        self.assertAlmostEqual(solution["cargo"][1]["loaded"], 1500)
+
+    def test_minimize_trains(self):
+        solver = MixedCargoSolver(
+            TestArgs(
+                {
+                    "cargo": [("iron", 100, 1200), ("copper", 100, 600)],
+                    "platform_rate": 2400,
+                    "rtd": 5,
+                    "minimize": "trains",
+                }
+            )
+        )
+        solution = solver.solve()
+        self.assertIsNotNone(solution)
+        self.assertEqual(solution["trains"], 1)
+        self.assertEqual(solution["cars"], 3)
+        self.assertEqual(solution["layout"], ["iron", "iron", "copper"])
+
+    def test_many_items(self):
+        cargo = [
+            (f"item_{i}", [50, 100, 200, 500][i % 4], 100 + 37 * i) for i in range(30)
+        ]
+        solver = MixedCargoSolver(
+            TestArgs(
+                {
+                    "cargo": cargo,
+                    "platform_rate": 2400,
+                    "rtd": 6,
+                    "max_trains": 10,
+                    "max_cars": 50,
+                }
+            )
+        )
+        solution = solver.solve()
+        self.assertIsNotNone(solution)
+        self.assertEqual(solution["cars"], len(solution["layout"]))
+        for item in solution["cargo"]:
+            self.assertGreaterEqual(item["throughput"], item["rate"])
+
+    def test_unsatisfiable(self):
+        solver = MixedCargoSolver(
+            TestArgs(
+                {
+                    "cargo": [("iron", 100, 1200), ("copper", 100, 600)],
+                    "platform_rate": 2400,
+                    "rtd": 5,
+                    "cars": 1,
+                }
+            )
+        )
+        self.assertIsNone(solver.solve())
+
+    def test_requires_rtd(self):
+        with self.assertRaises(ValueError):
+            MixedCargoSolver(
+                TestArgs({"cargo": [("iron", 100, 1200)], "platform_rate": 2400})
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+from sat_is_factory.train_solver import plan
+from sat_is_factory.train_solver.arguments import get_arguments
+
+GRAPH = {
+    "defaults": {"rtd": "5:00"},
+    "items": {"water": {"fluid": True}},
+    "sites": {
+        "mine": {"recipes": [{"count": 2, "outputs": {"iron_ore": 240}}]},
+        "mine2": {"recipes": [{"count": 1, "outputs": {"iron_ore": 240}}]},
+        "pump": {"recipes": [{"outputs": {"water": 120}}]},
+        "smelter": {
+            "recipes": [
+                {"count": 8, "inputs": {"iron_ore": 30}, "outputs": {"iron_ingot": 30}}
+            ]
+        },
+        "mill": {
+            "recipes": [
+                {
+                    "count": 4,
+                    "inputs": {"iron_ingot": 60, "water": 30},
+                    "outputs": {"iron_plate": 40},
+                }
+            ]
+        },
+    },
+    "routes": {"mine2 -> smelter": {"rtd": "4:00"}},
+}
+
+
+class TestPlan(unittest.TestCase):
+    def test_flows(self):
+        flows = {
+            (flow["source"], flow["sink"], flow["item"]): flow["rate"]
+            for flow in plan.flows(GRAPH)
+        }
+        self.assertEqual(len(flows), 4)
+        self.assertAlmostEqual(flows[("mine", "smelter", "iron_ore")], 160)
+        self.assertAlmostEqual(flows[("mine2", "smelter", "iron_ore")], 80)
+        self.assertAlmostEqual(flows[("smelter", "mill", "iron_ingot")], 240)
+        self.assertAlmostEqual(flows[("pump", "mill", "water")], 120)
+
+    def test_not_enough_supply(self):
+        graph = {
+            "sites": {
+                "mine": {"recipes": [{"outputs": {"iron_ore": 60}}]},
+                "smelter": {"recipes": [{"count": 3, "inputs": {"iron_ore": 30}}]},
+            }
+        }
+        with self.assertRaises(ValueError):
+            plan.flows(graph)
+
+    def test_scenario(self):
+        flows = plan.flows(GRAPH)
+        water = next(flow for flow in flows if flow["item"] == "water")
+        self.assertEqual(
+            plan.scenario(GRAPH, water),
+            ["--source", "120.0", "--sink", "120.0", "--rtd", "5:00", "--fluid"],
+        )
+        ore = next(flow for flow in flows if flow["source"] == "mine2")
+        args = get_arguments(plan.scenario(GRAPH, ore))
+        self.assertAlmostEqual(args.rtd, 4)
+        self.assertAlmostEqual(args.source_rate, 80)
+
+    def test_solve_all(self):
+        flows = plan.flows(GRAPH)
+        scenarios = [get_arguments(plan.scenario(GRAPH, flow)) for flow in flows]
+        scenarios.append(scenarios[0])
+        solutions = plan.solve_all(scenarios, jobs=2)
+        self.assertEqual(len(solutions), 5)
+        self.assertEqual(solutions[0], solutions[-1])
+        for args, solution in zip(scenarios, solutions):
+            self.assertIsNotNone(solution)
+            self.assertGreaterEqual(solution["throughput"], args.source_rate)
+        self.assertEqual(solutions, plan.solve_all(scenarios, jobs=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
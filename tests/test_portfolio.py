@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from sat_is_factory.train_solver import portfolio
+from sat_is_factory.train_solver.arguments import get_arguments
+from sat_is_factory.train_solver.train_solver import Solver
+
+
+class TestPortfolio(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = os.path.join(self.directory.name, "cache", "portfolio.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_shape(self):
+        a = portfolio.shape(get_arguments(["--rtd", "9", "--throughput", "3000"]))
+        b = portfolio.shape(get_arguments(["--rtd", "4.5", "--throughput", "120"]))
+        c = portfolio.shape(get_arguments(["--rtd", "9", "--source", "3000"]))
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+        with self.assertRaises(ValueError):
+            portfolio.shape(get_arguments(["--rtd", "0.1"]))
+
+    @patch.dict(portfolio.STRATEGIES, {"bogus": (Solver, {"no_such_option": 1})})
+    def test_available(self):
+        self.assertNotIn("bogus", portfolio.available())
+        self.assertEqual(portfolio.available(["z3", "bogus"]), ["z3"])
+
+    def test_race(self):
+        args = get_arguments(["--rtd", "9", "--throughput", "3000"])
+        name, status, solution = portfolio.race(args)
+        self.assertIn(name, portfolio.STRATEGIES)
+        self.assertEqual(status, "solution")
+        self.assertEqual(solution["trains"], 5)
+        self.assertEqual(solution["cars"], 2)
+
+    def test_race_unknown(self):
+        # The symba engine gives up on nonlinear objectives.
+        args = get_arguments([])
+        self.assertEqual(portfolio.run("z3_symba", args)[0], "unknown")
+        name, status, solution = portfolio.race(args, ["z3_symba", "z3"])
+        self.assertEqual(name, "z3")
+        self.assertEqual(solution, Solver(args).solve())
+        self.assertEqual(portfolio.race(args, ["z3_symba"])[0], None)
+
+    def test_solve(self):
+        args = get_arguments(["--rtd", "9", "--throughput", "3000"])
+        name, solution = portfolio.solve(args, self.cache, ["z3", "z3_symba"])
+        self.assertIn(name, ["z3", "z3_symba"])
+        self.assertEqual(solution["trains"], 5)
+        self.assertEqual(portfolio.load(self.cache), {portfolio.shape(args): name})
+
+        # Later queries of the same shape use the winner without racing.
+        args = get_arguments(["--rtd", "13", "--throughput", "2000"])
+        with patch.object(portfolio, "race") as race:
+            self.assertEqual(
+                portfolio.solve(args, self.cache, ["z3", "z3_symba"]),
+                (name, Solver(args).solve()),
+            )
+            race.assert_not_called()
+
+    def test_solve_error(self):
+        args = get_arguments(["--trains", "3", "--max-trains", "2"])
+        with self.assertRaises(ValueError):
+            portfolio.solve(args, self.cache)
+        self.assertEqual(portfolio.load(self.cache), {})
+
+    def test_solve_unsat(self):
+        args = get_arguments(["--rtd", "1", "--throughput", "90000"])
+        self.assertEqual(portfolio.solve(args, None, ["z3"]), ("z3", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
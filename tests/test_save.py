@@ -0,0 +1,177 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+
+from sat_is_factory.train_solver import save
+from sat_is_factory.train_solver.arguments import get_arguments
+
+
+def fstring(value):
+    if value == "":
+        return struct.pack("<i", 0)
+    data = value.encode("latin-1") + b"\0"
+    return struct.pack("<i", len(data)) + data
+
+
+def prop(name, kind, value, header=b"\0"):
+    return (
+        fstring(name)
+        + fstring(kind)
+        + struct.pack("<ii", len(value), 0)
+        + header
+        + value
+    )
+
+
+def int_prop(name, value):
+    return prop(name, "IntProperty", struct.pack("<i", value))
+
+
+def float_prop(name, value):
+    return prop(name, "FloatProperty", struct.pack("<f", value))
+
+
+def str_prop(name, value):
+    return prop(name, "StrProperty", fstring(value))
+
+
+def object_prop(name, value):
+    return prop(name, "ObjectProperty", fstring("Persistent_Level") + fstring(value))
+
+
+def objects_prop(name, values):
+    value = struct.pack("<i", len(values))
+    for path in values:
+        value += fstring("Persistent_Level") + fstring(path)
+    return prop(name, "ArrayProperty", value, fstring("ObjectProperty") + b"\0")
+
+
+def record(class_path, instance, *properties):
+    data = b"".join(properties) + fstring("None")
+    return fstring(class_path) + fstring(instance) + struct.pack("<i", len(data)) + data
+
+
+def write_save(path, records, chunk_size=64, v2=True):
+    body = b"".join(records)
+    body = struct.pack("<q", len(body)) + body
+    with open(path, "wb") as file:
+        file.write(struct.pack("<ii", 13, 42) + fstring("synthetic save"))
+        for i in range(0, len(body), chunk_size):
+            chunk = body[i : i + chunk_size]
+            compressed = zlib.compress(chunk)
+            if v2:
+                header = struct.pack(
+                    "<IIqB", save.PACKAGE_FILE_TAG, save.ARCHIVE_V2_HEADER, 131072, 3
+                )
+            else:
+                header = struct.pack("<IIq", save.PACKAGE_FILE_TAG, 0, 131072)
+            sizes = (len(compressed), len(chunk))
+            file.write(header + struct.pack("<qqqq", *sizes, *sizes) + compressed)
+
+
+RECORDS = [
+    record(save.STATION, "Station_1", str_prop("mStationName", "Mine")),
+    record(save.STATION, "Station_2", str_prop("mStationName", "Smelter")),
+    record(
+        "/Game/FactoryGame/Buildable/Factory/ConveyorBeltMk1/Build_ConveyorBeltMk1.Build_ConveyorBeltMk1_C",
+        "Belt_1",
+        float_prop("mSpeed", 60),
+        str_prop("mPadding", "x" * 500),
+    ),
+    record(
+        save.PLATFORM,
+        "Platform_1",
+        object_prop("mStation", "Station_1"),
+        float_prop("mPlatformRate", 1560),
+    ),
+    record(
+        save.PLATFORM,
+        "Platform_2",
+        prop("mIsInLoadMode", "BoolProperty", b"", b"\1\0"),
+        object_prop("mStation", "Station_1"),
+        float_prop("mPlatformRate", 2400),
+    ),
+    record(save.FLUID_PLATFORM, "Platform_3", object_prop("mStation", "Station_3")),
+    record(
+        save.TRAIN,
+        "Train_1",
+        objects_prop("mStops", ["Station_1", "Station_2"]),
+        int_prop("mNumCars", 2),
+    ),
+    record(
+        save.TRAIN,
+        "Train_2",
+        prop("mUnknown", "StructProperty", b"\0" * 20),
+        objects_prop("mStops", ["Station_1", "Station_2"]),
+        int_prop("mNumCars", 2),
+    ),
+    record(save.TRAIN, "Train_3", objects_prop("mStops", ["Station_3"])),
+]
+
+
+class TestSave(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "test.sav")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_chunks(self):
+        write_save(self.path, RECORDS, chunk_size=100)
+        with open(self.path, "rb") as file:
+            data = file.read()
+        body = b"".join(save.chunks(data, jobs=2, window=3))
+        self.assertEqual(body[8:], b"".join(RECORDS))
+
+    def test_objects(self):
+        write_save(self.path, RECORDS)
+        objects = list(save.objects(self.path, jobs=2))
+        self.assertEqual(len(objects), 8)
+        self.assertEqual(
+            objects[3],
+            (
+                save.PLATFORM,
+                "Platform_2",
+                {"mIsInLoadMode": True, "mStation": "Station_1", "mPlatformRate": 2400},
+            ),
+        )
+
+    def test_routes(self):
+        for v2 in [True, False]:
+            write_save(self.path, RECORDS, v2=v2)
+            routes = save.routes(self.path)
+            self.assertEqual(
+                routes,
+                [
+                    {
+                        "stops": ["Mine", "Smelter"],
+                        "trains": 2,
+                        "cars": 2,
+                        "platforms": 2,
+                        "platform_rate": 1560,
+                        "fluid": False,
+                    }
+                ],
+            )
+
+    def test_scenario(self):
+        write_save(self.path, RECORDS)
+        (route,) = save.routes(self.path)
+        args = get_arguments(save.scenario(route))
+        self.assertEqual(args.trains, 2)
+        self.assertEqual(args.cars, 2)
+        self.assertEqual(args.platform_rate, 1560)
+
+    def test_truncated(self):
+        write_save(self.path, RECORDS)
+        with open(self.path, "r+b") as file:
+            file.truncate(os.path.getsize(self.path) - 20)
+        with self.assertRaises(ValueError):
+            save.routes(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import io
+import unittest
+from contextlib import redirect_stderr
+
+from sat_is_factory.train_solver.shell import Session
+
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        self.reports = []
+        self.session = Session(
+            ["--rtd", "9", "--throughput", "3000"], self.report, debounce=0.05
+        )
+
+    def tearDown(self):
+        self.session.close()
+
+    def report(self, args, solution, latency, error):
+        self.reports.append((args, solution, error))
+
+    def test_initial(self):
+        self.session.wait()
+        self.assertEqual(len(self.reports), 1)
+        _, solution, error = self.reports[0]
+        self.assertIsNone(error)
+        self.assertEqual(solution["trains"], 5)
+        self.assertEqual(solution["cars"], 2)
+
+    def test_edit(self):
+        self.session.wait()
+        self.session.edit({"--minimize": "trains"})
+        self.session.wait()
+        _, solution, _ = self.reports[-1]
+        self.assertEqual(solution["trains"], 1)
+        self.assertEqual(solution["cars"], 9)
+
+        self.session.edit({"--minimize": False, "--max-trains": "2", "--rtd": "13"})
+        self.session.wait()
+        _, solution, _ = self.reports[-1]
+        self.assertEqual(solution["trains"], 2)
+        self.assertEqual(solution["cars"], 7)
+
+    def test_debounce(self):
+        self.session.wait()
+        for cars in range(1, 6):
+            self.session.edit({"--cars": str(cars)})
+        self.session.wait()
+        self.assertEqual(len(self.reports), 2)
+        args, solution, _ = self.reports[-1]
+        self.assertEqual(args.cars, 5)
+        self.assertEqual(solution["cars"], 5)
+
+    def test_invalid(self):
+        self.session.wait()
+        with self.assertRaises(SystemExit), redirect_stderr(io.StringIO()):
+            self.session.edit({"--source": "0"})
+        self.assertEqual(self.session.options["--throughput"], "3000")
+
+        self.session.edit({"--rtd": "0.1"})
+        self.session.wait()
+        _, solution, error = self.reports[-1]
+        self.assertIsNone(solution)
+        self.assertIsInstance(error, ValueError)
+
+
+if __name__ == "__main__":
+    unittest.main()
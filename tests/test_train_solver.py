@@ -1,7 +1,18 @@
+import io
 import unittest
+from contextlib import redirect_stderr, redirect_stdout
 
 from sat_is_factory.train_solver import Solver
-from sat_is_factory.train_solver.train_solver import CAR_CAPACITY
+from sat_is_factory.train_solver.__main__ import print_solution
+from sat_is_factory.train_solver.arguments import get_arguments
+from sat_is_factory.train_solver.train_solver import (
+    ABSOLUTE_MAX_TRAINS,
+    CAR_CAPACITY,
+    DOCK_DURATION,
+    Schedule,
+    Sensitivity,
+    platform_groups,
+)
 
 
 class TestArgs:
@@ -17,6 +28,8 @@ class TestArgs:
         self.rtd = None
         self.throughput = None
         self.minimize = None
+        self.source_platforms = None
+        self.sink_platforms = None
         for key, value in dict.items():
             setattr(self, key, value)
 
@@ -317,5 +330,252 @@ class TestMaximizingThroughput(unittest.TestCase):
         self.assertAlmostEqual(solution["throughput"], 1289.0256 * 2, places=3)
 
 
+# Updating the arguments of an existing solver.
+class TestUpdate(unittest.TestCase):
+    def test_update(self):
+        params = {
+            "stack_size": 100,
+            "platform_rate": 2400,
+            "rtd": 9,
+            "throughput": 3000,
+        }
+        solver = Solver(TestArgs(params))
+        self.assertEqual(solver.solve()["trains"], 5)
+
+        solver.update(TestArgs({**params, "minimize": "trains"}))
+        solution = solver.solve()
+        self.assertIsNotNone(solution)
+        self.assertEqual(solution["trains"], 1)
+        self.assertEqual(solution["cars"], 9)
+
+        solver.update(TestArgs({**params, "source_rate": 3000, "sink_rate": 2000}))
+        solution = solver.solve()
+        self.assertIsNotNone(solution)
+        self.assertEqual(solution["trains"], 5)
+        self.assertAlmostEqual(solution["sink"]["rate"], 2000)
+
+
+# Evenly spaced schedules for multiple trains.
+class TestSchedule(unittest.TestCase):
+    def test_full(self):
+        solver = Solver(
+            TestArgs(
+                {
+                    "stack_size": 100,
+                    "platform_rate": 2400,
+                    "rtd": 9,
+                    "throughput": 3000,
+                }
+            )
+        )
+        solution = solver.solve()
+        self.assertIsNotNone(solution)
+        schedule = solution["schedule"]
+        self.assertTrue(schedule["wait"]["full"])
+        self.assertAlmostEqual(schedule["headway"], 1.8)
+        self.assertEqual(len(schedule["departures"]), 5)
+        self.assertAlmostEqual(schedule["departures"][1], 1.8 + 0.45133333 + 4 / 3)
+        self.assertEqual(schedule["collisions"], [])
+
+    def test_partial(self):
+        solver = Solver(
+            TestArgs(
+                {
+                    "stack_size": 100,
+                    "platform_rate": 2400,
+                    "trains": 3,
+                    "cars": 2,
+                    "rtd": 5,
+                }
+            )
+        )
+        solution = solver.solve()
+        self.assertIsNotNone(solution)
+        schedule = solution["schedule"]
+        self.assertFalse(schedule["wait"]["full"])
+        # Platform bound trains are docked for the whole headway.
+        for start, end in schedule["windows"]["source"]:
+            self.assertAlmostEqual(end - start, 5 / 3)
+        self.assertEqual(schedule["collisions"], [])
+
+    def test_collisions(self):
+        schedule = Schedule(3, 1, 3200, 2400, True)
+        self.assertEqual(schedule.collisions, [(0, 1), (1, 2), (2, 0)])
+
+    def test_max_trains(self):
+        schedule = Schedule(ABSOLUTE_MAX_TRAINS, 120, 3200, 2400, True)
+        self.assertEqual(len(schedule.windows), ABSOLUTE_MAX_TRAINS)
+        self.assertEqual(schedule.collisions, [])
+
+
+# Marginal throughput of one more train, car or second of RTD.
+class TestSensitivity(unittest.TestCase):
+    def args(self, **values):
+        return TestArgs({"stack_size": 100, "platform_rate": 2400} | values)
+
+    def test_deltas(self):
+        solution = Solver(self.args(rtd=9, throughput=3000)).solve(sensitivity=True)
+        sensitivity = solution["sensitivity"]
+        self.assertEqual(sensitivity["regime"], "capacity")
+
+        # Each delta matches solving again for the maximum throughput.
+        for key, trains, cars, rtd in [
+            ("trains+1", 6, 2, 9),
+            ("trains-1", 4, 2, 9),
+            ("cars+1", 5, 3, 9),
+            ("cars-1", 5, 1, 9),
+            ("rtd-10s", 5, 2, 9 - 10 / 60),
+        ]:
+            other = Solver(self.args(trains=trains, cars=cars, rtd=rtd)).solve()
+            delta = sensitivity["deltas"][key]
+            for value in ["throughput", "efficiency", "loaded"]:
+                self.assertAlmostEqual(
+                    delta[value], other[value] - solution[value], places=6, msg=key
+                )
+
+    def test_derivatives(self):
+        for trains, cars, rtd in [(3, 2, 5), (2, 3, 7), (1, 1, 1.7847)]:
+            sensitivity = Sensitivity(100, 2400, trains, cars, rtd)
+            step = 1e-6
+            after = sensitivity.evaluate(trains, cars, rtd)
+            before = sensitivity.evaluate(trains, cars, rtd - step)
+            for value in ["throughput", "efficiency", "loaded"]:
+                derivative = sensitivity.derivatives[value] * 60
+                self.assertAlmostEqual(
+                    derivative,
+                    (after[value] - before[value]) / step,
+                    delta=1e-5 * max(abs(derivative), 1),
+                )
+
+    def test_regime(self):
+        self.assertEqual(Sensitivity(100, 2400, 3, 2, 5).regime, "platform")
+        self.assertEqual(Sensitivity(100, 2400, 5, 2, 9).regime, "capacity")
+        solution = Solver(self.args(trains=1, cars=1)).solve(sensitivity=True)
+        self.assertEqual(solution["sensitivity"]["regime"], "balanced")
+
+    def test_source(self):
+        # A source slower than the throughput limits what's loaded.
+        sensitivity = Sensitivity(100, 2400, 2, 2, 9, source_rate=1000)
+        self.assertAlmostEqual(sensitivity.derivatives["loaded"] * 60, 1000 / 4)
+
+    def test_impossible(self):
+        sensitivity = Sensitivity(100, 2400, 1, 1, 0.5)
+        self.assertIsNone(sensitivity.deltas["trains-1"])
+        self.assertIsNone(sensitivity.deltas["cars-1"])
+        self.assertIsNone(sensitivity.deltas["rtd-10s"])
+
+    def test_optional(self):
+        solution = Solver(self.args(rtd=9, throughput=3000)).solve()
+        self.assertNotIn("sensitivity", solution)
+
+
+# Platforms fed by different belts or pipes.
+class TestPlatforms(unittest.TestCase):
+    def args(self, source, sink=None, **values):
+        sink = sink or source
+        return TestArgs(
+            {
+                "stack_size": 100,
+                "platform_rate": min(map(min, source, sink)),
+                "cars": len(source),
+                "source_platforms": source,
+                "sink_platforms": sink,
+            }
+            | values
+        )
+
+    def test_groups(self):
+        self.assertEqual(
+            platform_groups([2400, 1200, 1200], [2400, 2400, 960]),
+            [(960, 1), (1200, 1), (2400, 1)],
+        )
+
+    def test_uniform(self):
+        uniform = Solver(
+            TestArgs({"stack_size": 100, "platform_rate": 2400, "cars": 3, "rtd": 4})
+        ).solve()
+        solution = Solver(self.args([2400] * 3, rtd=4)).solve()
+        for key in ["trains", "rtd", "throughput", "efficiency", "loaded"]:
+            self.assertAlmostEqual(solution[key], uniform[key], msg=key)
+
+    def test_mixed(self):
+        solution = Solver(self.args([2400, 1200, 1200], trains=1, rtd=3)).solve()
+        self.assertIsNotNone(solution)
+        partial = 1200 * (3 - DOCK_DURATION)
+        self.assertAlmostEqual(solution["throughput"], (3200 + 2 * partial) / 3)
+        self.assertEqual(solution["station_rate"], 4800)
+
+        platforms = solution["platforms"]
+        limits = [car["limit"] for car in platforms["cars"]]
+        self.assertEqual(limits, ["capacity", "platform", "platform"])
+        self.assertAlmostEqual(platforms["cars"][0]["loaded"], 3200)
+        self.assertAlmostEqual(platforms["cars"][1]["loaded"], partial)
+        # The train waits for the first of the slow cars.
+        self.assertEqual(platforms["bottleneck"], 1)
+        self.assertAlmostEqual(solution["schedule"]["wait"]["time"], partial / 1200)
+
+    def test_optimal(self):
+        # Every car is just filled, including the slowest.
+        solution = Solver(self.args([2400, 1200], [960, 2400], trains=1)).solve()
+        self.assertAlmostEqual(solution["rtd"], DOCK_DURATION + 3200 / 960)
+        self.assertAlmostEqual(solution["throughput"], 6400 / solution["rtd"])
+        self.assertTrue(solution["schedule"]["wait"]["full"])
+
+    def test_buffers(self):
+        solution = Solver(
+            self.args([2400, 1200], source_rate=1800, sink_rate=900, trains=1, rtd=6)
+        ).solve()
+        cars = solution["platforms"]["cars"]
+        self.assertAlmostEqual(
+            cars[0]["buffer"]["source"]["size"], DOCK_DURATION * 1200
+        )
+        self.assertAlmostEqual(cars[1]["buffer"]["source"]["size"], DOCK_DURATION * 600)
+        self.assertAlmostEqual(cars[1]["buffer"]["sink"]["size"], DOCK_DURATION * 300)
+
+    def print(self, solution):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            print_solution(solution, "items")
+        return output.getvalue()
+
+    def test_empty_sink_buffer(self):
+        # The sink's share of each platform is its whole rate.
+        args = get_arguments(
+            ["--source-platforms", "1200,1200", "--source", "1000", "--sink", "2400"]
+            + ["--rtd", "5"]
+        )
+        solution = Solver(args).solve()
+        for car in solution["platforms"]["cars"]:
+            self.assertEqual(list(car["buffer"]), ["source"])
+            self.assertGreater(car["buffer"]["source"]["time"], 0)
+        self.assertIn("sink buffer would be empty", self.print(solution))
+
+    def test_full_source_buffer(self):
+        args = get_arguments(
+            ["--source-platforms", "1200,1200", "--throughput", "100"]
+            + ["--source", "2400", "--rtd", "5"]
+        )
+        solution = Solver(args).solve()
+        for car in solution["platforms"]["cars"]:
+            self.assertNotIn("buffer", car)
+        output = self.print(solution)
+        self.assertNotIn("in source buffer,", output)
+        self.assertIn("source buffer would be full", output)
+
+    def test_arguments(self):
+        args = get_arguments(["--source-platforms", "2400,1200", "--rtd", "5"])
+        self.assertEqual(args.cars, 2)
+        self.assertEqual(args.sink_platforms, [2400, 1200])
+        self.assertEqual(args.platform_rate, 1200)
+        for argv in [
+            ["--source-platforms", "2400,1200", "--sink-platforms", "2400"],
+            ["--source-platforms", "2400,1200", "--platform", "1200"],
+            ["--source-platforms", "2400,1200", "--cars", "3"],
+            ["--source-platforms", "2400,0"],
+        ]:
+            with self.assertRaises(SystemExit), redirect_stderr(io.StringIO()):
+                get_arguments(argv)
+
+
 if __name__ == "__main__":
     unittest.main()